@@ -10,8 +10,10 @@
 
 
 
+import os
 import sys
-import fasta
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from fasta_index import IndexedFASTA
 
 # Set k value according to command line input
 k = int(sys.argv[3])
@@ -23,8 +25,7 @@ k = int(sys.argv[3])
 # key: k-mer nucleotides; value: start location in fasta file
 
 # Read target file, run through FASTA reader
-target_file = open(sys.argv[1])
-target = fasta.FASTAReader(target_file)
+target = IndexedFASTA(sys.argv[1])
 
 # Generate target kmers from target sequence
 # Make dictionary of kmers and their positions
@@ -44,13 +45,12 @@ for t_ident, t_sequence in target:
 # Look up kmers from query file in dictionary of target kmers
 
 # Read query file, run through FASTA reader
-query_file = open(sys.argv[2])
-query = fasta.FASTAReader(query_file)
+query = IndexedFASTA(sys.argv[2])
 
 # Generate query kmers from query sequence
 # Look up query kmers in target dictionary
 # If query kmer is in dictionary, print out relevant info
-# t_ident is the target sequence name, and comes from the fasta.py function
+# t_ident is the target sequence name, and comes from the FASTA reader
 for q_ident, q_sequence in query:
     for i in range(0, len(q_sequence) - k):
         query_kmer = q_sequence[i:i+k]
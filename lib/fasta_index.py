@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+"""
+Indexed, memory-mapped FASTA reader. This is meant to replace walking fasta.FASTAReader over
+the whole file every time a script runs.
+
+The first time a FASTA file is opened, a samtools-style .fai index is written next to it
+(<file>.fai). Every line of the index has five tab-separated fields:
+
+name      - Record name (the first word of the header, without the ">")
+length    - Number of bases in the record
+offset    - Byte offset of the first base of the record
+linebases - Number of bases on each full line
+linewidth - Number of bytes on each full line, including the line break
+
+Later runs just read the .fai file (it is rebuilt if the FASTA file is newer), so looking up
+any record or any subrange of a record is a seek into the memory-mapped file instead of a scan.
+
+Iterating over the reader works like fasta.FASTAReader: idents are the whole header line after
+the ">" (the index only keeps the first word), and files that can't be indexed because their
+lines have different lengths are still read, from start to end. Only random access (fetch(),
+view(), entries, lengths()) needs the index, and raises ValueError without one.
+
+Example:
+    reader = IndexedFASTA("contigs.fa")
+    reader.lengths()                  # every record length, straight from the index
+    reader.fetch(40000)               # the 40,001st record as a str
+    reader.fetch("NODE_1", 100, 200)  # bases 100-199 of (the first) record NODE_1
+    for ident, sequence in reader:    # drop-in replacement for fasta.FASTAReader
+        ...
+"""
+
+import os
+import mmap
+
+
+class IndexedFASTA(object):
+
+    def __init__(self, filename, index_filename=None):
+        self.filename = filename
+        self.index_filename = index_filename or filename + ".fai"
+
+        # Map the whole file read-only. Empty files can't be mapped, so leave them unmapped
+        self.file = open(filename, "rb")
+        if os.fstat(self.file.fileno()).st_size > 0:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.mm = b""
+
+        # Each entry is (name, length, offset, linebases, linewidth), in file order. Names don't
+        # have to be unique (bedtools getfasta repeats them for duplicate intervals); like
+        # samtools faidx, looking a name up gives its first record, so code that needs every
+        # record should go through entries or look records up by position
+        self.names = {}
+        try:
+            self._entries = self.load_index()
+            self.index_error = None
+        except ValueError as error:
+            # Lines of different lengths: no random access, but the file can still be streamed
+            self._entries = None
+            self.index_error = "%s: %s" % (filename, error)
+            return
+        for i, entry in enumerate(self._entries):
+            self.names.setdefault(entry[0], i)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            raise ValueError(self.index_error)
+        return self._entries
+
+    def __len__(self):
+        # Without an index the number of records isn't known (TypeError, like any unsized
+        # object, so list(reader) still works)
+        if self._entries is None:
+            raise TypeError(self.index_error)
+        return len(self._entries)
+
+    def __iter__(self):
+        # Same interface as fasta.FASTAReader: yields (ident, sequence) with the whole header line
+        # as ident and sequence as a str
+        if self._entries is None:
+            for header, sequence in iter_records(self.mm):
+                yield header, sequence.decode("ascii")
+            return
+        for i, (name, sequence) in enumerate(self.views()):
+            yield self.header(i), bytes(sequence).decode("ascii")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.file.close()
+
+
+    # Building and caching the index
+
+    def load_index(self):
+        # If we can't write next to the FASTA file, just keep the index in memory
+        try:
+            return read_fai(ensure_index(self.filename, self.index_filename, self.mm))
+        except OSError:
+            return build_index(self.mm)
+
+
+    # Random access
+
+    def entry(self, key):
+        # Records can be looked up by name or by their position in the file
+        if isinstance(key, int):
+            return self.entries[key]
+        return self.entries[self.names[key]]
+
+    def lengths(self):
+        return [entry[1] for entry in self.entries]
+
+    def header(self, key):
+        # The whole header line of a record, without the ">"; it's the line just before the
+        # record's first base
+        end = min(self.entry(key)[2] - 1, len(self.mm))
+        start = self.mm.rfind(b"\n", 0, end) + 1
+        return bytes(self.mm[start + 1:end]).decode("ascii").rstrip("\r")
+
+    def view(self, key, start=0, end=None):
+        """
+        Bases [start, end) of a record as raw bytes. If the requested range lies on a single
+        line of the file this is a zero-copy memoryview into the mapped file; otherwise the
+        line breaks have to be removed, so a new bytes object is returned.
+        """
+        name, length, offset, linebases, linewidth = self.entry(key)
+        if end is None or end > length:
+            end = length
+        start = max(0, min(start, end))
+        if start == end:
+            return memoryview(b"")
+
+        # Byte position of base i is offset + (i // linebases) * linewidth + i % linebases
+        first_line = start // linebases
+        last_line = (end - 1) // linebases
+        begin = offset + first_line * linewidth + start % linebases
+        if first_line == last_line:
+            return memoryview(self.mm)[begin:begin + (end - start)]
+
+        # Spans several lines: copy the raw bytes once and drop the line breaks
+        stop = offset + last_line * linewidth + (end - 1) % linebases + 1
+        return b"".join(self.mm[begin:stop].split())
+
+    def fetch(self, key, start=0, end=None):
+        return bytes(self.view(key, start, end)).decode("ascii")
+
+
+    # Streaming
+
+    def views(self):
+        """
+        Iterate over every record as (name, sequence bytes). Single-line records are yielded as
+        zero-copy memoryviews; wrapped records are joined one at a time, so only one record's
+        worth of sequence is ever held in memory. Files without an index are read from start to
+        end instead, with the same record names (the first word of the header).
+        """
+        if self._entries is None:
+            for header, sequence in iter_records(self.mm):
+                words = header.split()
+                yield (words[0] if words else ""), sequence
+            return
+        for i, entry in enumerate(self.entries):
+            yield entry[0], self.view(i)
+
+
+def ensure_index(filename, index_filename=None, data=None):
+    """
+    Make sure filename has an up-to-date .fai index and return the index's filename. An existing
+    .fai file is reused if it is at least as new as the FASTA file. Entries are written out as
+    they are found, so building the index never holds the whole index in memory.
+    """
+    index_filename = index_filename or filename + ".fai"
+    if os.path.exists(index_filename) and \
+            os.path.getmtime(index_filename) >= os.path.getmtime(filename):
+        return index_filename
+    if data is None:
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                write_fai(index_filename, [])
+                return index_filename
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                write_fai(index_filename, iter_index(mm))
+    else:
+        write_fai(index_filename, iter_index(data))
+    return index_filename
+
+
+def build_index(data):
+    return list(iter_index(data))
+
+
+def iter_index(data):
+    """
+    Scan a mapped FASTA file once and yield a (name, length, offset, linebases, linewidth)
+    entry for each record. Like samtools faidx, every line of a record except the last must
+    have the same length. Blank lines are allowed only at the end of a record.
+    """
+    size = len(data)
+    pos = 0
+
+    # Fields for the record currently being scanned
+    name = None
+    length = offset = linebases = linewidth = 0
+    # Set once we see a short (last) line or a blank line; any later sequence line is an error
+    ended = False
+
+    while pos < size:
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            newline = size
+        line_end = newline
+        if line_end > pos and data[line_end - 1:line_end] == b"\r":
+            line_end -= 1
+        n_bases = line_end - pos
+        n_bytes = newline + 1 - pos
+
+        if data[pos:pos + 1] == b">":
+            # Finish the previous record and start a new one
+            if name is not None:
+                yield name, length, offset, linebases, linewidth
+            header = bytes(data[pos + 1:line_end]).decode("ascii").split()
+            name = header[0] if header else ""
+            length = linebases = linewidth = 0
+            offset = newline + 1
+            ended = False
+        elif n_bases == 0:
+            ended = True
+        elif name is None:
+            raise ValueError("%s: sequence found before the first header line" % pos)
+        else:
+            if ended:
+                raise ValueError("Record %s has lines of different lengths; can't index it" % name)
+            if linebases == 0:
+                linebases = n_bases
+                linewidth = n_bytes
+            elif n_bases > linebases:
+                raise ValueError("Record %s has lines of different lengths; can't index it" % name)
+            elif n_bases < linebases:
+                ended = True
+            length += n_bases
+
+        pos = newline + 1
+
+    if name is not None:
+        yield name, length, offset, linebases, linewidth
+
+
+def iter_records(data):
+    """
+    Yield (header, sequence bytes) for every record, reading the file from start to end the way
+    fasta.FASTAReader does: the header is the whole line after the ">", and sequence lines can
+    be any length. This is for files that can't be indexed.
+    """
+    size = len(data)
+    pos = 0
+    header = None
+    sequence = []
+    while pos < size:
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            newline = size
+        line = bytes(data[pos:newline]).rstrip(b"\r")
+        if line.startswith(b">"):
+            if header is not None:
+                yield header, b"".join(sequence)
+            header = line[1:].decode("ascii")
+            sequence = []
+        elif header is not None:
+            sequence.append(line.strip())
+        pos = newline + 1
+    if header is not None:
+        yield header, b"".join(sequence)
+
+
+def read_fai(filename):
+    entries = []
+    for line in open(filename):
+        fields = line.rstrip("\r\n").split("\t")
+        entries.append((fields[0], int(fields[1]), int(fields[2]), int(fields[3]), int(fields[4])))
+    return entries
+
+
+def write_fai(filename, entries):
+    # Write to a temporary file first, so a FASTA file that turns out to be unindexable never
+    # leaves a half-written (but newer) .fai file behind
+    temp_filename = filename + ".tmp"
+    try:
+        with open(temp_filename, "w") as out:
+            for entry in entries:
+                out.write("\t".join(str(x) for x in entry) + "\n")
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+    os.replace(temp_filename, filename)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+Counts of snpEff annotations (the ANN= INFO field), per sample.
+
+Each ANN value is a comma-separated list of annotations, one per allele and feature:
+
+    Allele | Annotation | Annotation_Impact | Gene_Name | Gene_ID | Feature_Type | ...
+
+where Annotation can be several effects joined with "&" (e.g. "splice_region_variant&intron_variant").
+Every effect and impact level of every annotation is counted once overall, and once for each
+sample whose genotype (GT) carries that annotation's allele. This is the same counting
+snpEff_summary.html does, so the percentages match its "Number of effects by type" table.
+
+The file is read one record at a time, so memory use only depends on the number of categories
+and samples. For big files the work can be split by chromosome over a process pool; each worker
+only parses the records on its own chromosomes.
+
+Example:
+    counts = count_annotations("snpeff.vcf.gz")
+    counts.effects["missense_variant"]   # [all, sample 1, sample 2, ...]
+    counts.percentages("effects")        # {effect: % of all effects}
+    header, rows = counts.table()
+"""
+
+import numpy as np
+from vcf_reader import VCFReader
+
+ALLELE, EFFECT, IMPACT = 0, 1, 2
+IMPACTS = ["HIGH", "MODERATE", "LOW", "MODIFIER"]
+
+
+class AnnotationCounts(object):
+
+    def __init__(self, samples):
+        self.samples = list(samples)
+        # category -> array of [count over all variants, count for each sample]
+        self.effects = {}
+        self.impacts = {}
+
+    def add(self, kind, category, carriers):
+        counts = getattr(self, kind)
+        if category not in counts:
+            counts[category] = np.zeros(len(self.samples) + 1, dtype=np.int64)
+        counts[category][0] += 1
+        counts[category][1:] += carriers
+
+    def merge(self, other):
+        # Add another set of counts (e.g. from another chromosome) into this one
+        for kind in ("effects", "impacts"):
+            for category, values in getattr(other, kind).items():
+                counts = getattr(self, kind)
+                if category in counts:
+                    counts[category] += values
+                else:
+                    counts[category] = values.copy()
+        return self
+
+    def percentages(self, kind="effects"):
+        # Share of all annotations for each category, largest first
+        counts = getattr(self, kind)
+        total = sum(values[0] for values in counts.values())
+        ordered = sorted(counts.items(), key=lambda item: (-item[1][0], item[0]))
+        return dict((category, 100.0 * values[0] / total if total else 0.0)
+                    for category, values in ordered)
+
+    def table(self):
+        # One row per effect and impact level: kind, category, all, then one column per sample
+        header = ["kind", "category", "all"] + self.samples
+        rows = []
+        for kind in ("impacts", "effects"):
+            counts = getattr(self, kind)
+            if kind == "impacts":
+                order = [x for x in IMPACTS if x in counts] + sorted(set(counts) - set(IMPACTS))
+            else:
+                order = list(self.percentages(kind))
+            for category in order:
+                rows.append([kind[:-1], category] + [int(x) for x in counts[category]])
+        return header, rows
+
+
+def parse_ann(raw):
+    # (allele, [effects], impact) for every annotation in one ANN value
+    annotations = []
+    for annotation in raw.split(","):
+        fields = annotation.split("|")
+        if len(fields) <= IMPACT:
+            continue
+        annotations.append((fields[ALLELE], fields[EFFECT].split("&"), fields[IMPACT]))
+    return annotations
+
+
+class GenotypeCodes(object):
+    """
+    Turns each record's GT strings into a bitmask of the alleles each sample carries. There are
+    only a few distinct GT strings in a file (0/1, 1/1, ./., ...), so each is parsed once and
+    after that it's a dictionary lookup per sample.
+    """
+
+    def __init__(self):
+        self.masks = {}
+
+    def mask(self, gt):
+        if gt not in self.masks:
+            mask = 0
+            for allele in gt.replace("|", "/").split("/"):
+                if allele.isdigit():
+                    mask |= 1 << int(allele)
+            self.masks[gt] = mask
+        return self.masks[gt]
+
+    def carriers(self, record):
+        # masks[i] has bit a set if sample i carries allele a
+        if record.raw_format is None or not record.raw_format.startswith("GT"):
+            return np.zeros(len(record.raw_samples), dtype=np.int64)
+        return np.array([self.mask(sample.split(":", 1)[0]) for sample in record.raw_samples],
+                        dtype=np.int64)
+
+
+def count_records(records, samples):
+    counts = AnnotationCounts(samples)
+    genotypes = GenotypeCodes()
+    for record in records:
+        raw = record.raw_info_value("ANN")
+        if raw is None or raw is True:
+            continue
+        masks = genotypes.carriers(record)
+        for allele, effects, impact in parse_ann(raw):
+            # Which samples carry this annotation's allele (ALT alleles are numbered from 1)
+            if allele in record.alt:
+                carriers = (masks >> (record.alt.index(allele) + 1)) & 1
+            else:
+                carriers = np.zeros(len(masks), dtype=np.int64)
+            for effect in effects:
+                counts.add("effects", effect, carriers)
+            counts.add("impacts", impact, carriers)
+    return counts
+
+
+def count_annotations(filename, chromosomes=None, exclude=None):
+    """
+    Count the annotations in one VCF file, only those on the given chromosomes, or all but those
+    on the exclude chromosomes.
+    """
+    with VCFReader(filename) as reader:
+        return count_records(reader.records(chromosomes, exclude), reader.samples)
+
+
+def list_chromosomes(filename):
+    """
+    Chromosome names for splitting a file into shards. Returns (chromosomes, declared): from the
+    ##contig lines if there are any (declared is True; records can still be on other contigs),
+    otherwise from a pass over the first column.
+    """
+    with VCFReader(filename) as reader:
+        chromosomes = reader.chromosomes()
+        if chromosomes:
+            return chromosomes, True
+        seen = {}
+        for record in reader:
+            seen[record.chrom] = True
+        return list(seen), False
+
+
+def count_shard(job):
+    filename, chromosomes, exclude = job
+    return count_annotations(filename, chromosomes, exclude)
+
+
+def parallel_count_annotations(filename, pool, workers):
+    """
+    Split the chromosomes into one group per worker, count each group in the pool, and add the
+    counts together. When the groups come from ##contig lines, one more shard counts the records
+    on contigs the header doesn't declare, so the total is always the same as
+    count_annotations().
+    """
+    chromosomes, declared = list_chromosomes(filename)
+    jobs = [(filename, chromosomes[i::workers], None) for i in range(workers)
+            if chromosomes[i::workers]]
+    if declared:
+        jobs.append((filename, None, chromosomes))
+    with VCFReader(filename) as reader:
+        counts = AnnotationCounts(reader.samples)
+    for shard in pool.imap_unordered(count_shard, jobs):
+        counts.merge(shard)
+    return counts
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Shared startup layer for the command line scripts.
+
+Importing matplotlib (and setting the ggplot style) takes longer than most of these scripts
+spend on the actual numbers, so scripts should only call pyplot() once they know they are
+going to draw something. Every script also takes a --no-plot flag: instead of a PNG it writes
+the table behind the plot, with the same name and a .tsv extension.
+
+Example:
+    no_plot = startup.pop_flag("--no-plot")
+    ...
+    if no_plot:
+        startup.write_table("af.tsv", ["AF"], [af_list])
+    else:
+        plt = startup.pyplot()
+        ...
+"""
+
+import sys
+import multiprocessing
+
+_pyplot = None
+
+
+def pop_flag(flag):
+    """
+    Remove a flag from sys.argv wherever it is, and return whether it was there. This lets
+    scripts that read positional sys.argv[1], sys.argv[2], ... keep doing so.
+    """
+    if flag in sys.argv[1:]:
+        sys.argv = [sys.argv[0]] + [arg for arg in sys.argv[1:] if arg != flag]
+        return True
+    return False
+
+
+def pyplot(style="ggplot"):
+    # Import matplotlib.pyplot the first time a plot is requested. Pass style=None to keep
+    # matplotlib's default style
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+        if style:
+            plt.style.use(style)
+        _pyplot = plt
+    return _pyplot
+
+
+def process_pool(workers):
+    # The scripts run at the top level with no __main__ guard, so fork the workers instead of
+    # having them re-import the script where that's possible
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    return context.Pool(workers)
+
+
+def write_table(filename, header, columns):
+    """
+    Write equal-length columns to a tab-separated file with a header line. Floats are written
+    with %g; everything else with str().
+    """
+    out = open(filename, "w")
+    out.write("\t".join(header) + "\n")
+    for row in zip(*columns):
+        out.write("\t".join(("%g" % x) if isinstance(x, float) else str(x) for x in row) + "\n")
+    out.close()
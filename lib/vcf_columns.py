@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""
+Columnar INFO/FORMAT extraction from VCF files.
+
+Instead of splitting every INFO string and every sample column in Python, the records are read
+in chunks with pandas' C parser (as strings, without building a table of the whole file), and
+each requested field is pulled out of a whole chunk at once with bulk string operations:
+
+- INFO fields are looked up by key, wherever they are in the INFO column
+- FORMAT fields are looked up by their position in each row's FORMAT string, so any FORMAT
+  layout and any number of samples works
+
+Only the extracted NumPy arrays are kept between chunks, or with info_histogram() only the bin
+counts, so a histogram of a whole-genome VCF takes memory for the bins and one chunk.
+
+Example:
+    columns = read_columns("snpeff.vcf.gz", info_keys=["AF", "DP"], format_keys=["GQ"])
+    columns.info["AF"]          # every AF value (multi-allelic sites give several)
+    columns.info_index["AF"]    # which variant each of those values came from
+    columns.format["GQ"]        # samples x variants float32 matrix, NaN where missing
+    info_histogram("snpeff.vcf.gz", "AF", np.linspace(0, 1, 101))   # 100 bin counts
+"""
+
+import re
+import csv
+import numpy as np
+import pandas as pd
+from vcf_reader import VCFReader, open_vcf
+
+INFO_COLUMN = 7
+FORMAT_COLUMN = 8
+
+
+class VCFColumns(object):
+
+    def __init__(self, samples, info, info_index, format, n_variants):
+        self.samples = samples
+        self.info = info
+        self.info_index = info_index
+        self.format = format
+        self.n_variants = n_variants
+
+
+def read_chunks(filename, skip_lines, chunk_size=100000):
+    """
+    Yield the records of a VCF file as pandas DataFrames of strings, chunk_size rows at a time,
+    skipping the first skip_lines (header) lines.
+    """
+    with open_vcf(filename) as f:
+        try:
+            chunks = pd.read_csv(f, sep="\t", header=None, skiprows=skip_lines, dtype=str,
+                                 na_filter=False, quoting=csv.QUOTE_NONE, chunksize=chunk_size)
+        except pd.errors.EmptyDataError:
+            # A header with no records
+            return
+        for chunk in chunks:
+            yield chunk
+
+
+def info_field(info, key):
+    """
+    Pull one key out of a Series of INFO strings. Returns (values, index): every value as a
+    float (comma-separated values are split, so multi-allelic sites give one value per allele),
+    and the position (0, 1, 2, ...) of the row each value came from, whatever info's index is.
+    Missing keys and "." values are dropped.
+    """
+    # pandas keeps counting the index across chunks; callers add their own offset
+    info = info.reset_index(drop=True)
+    raw = info.str.extract("(?:^|;)" + re.escape(key) + "=([^;]*)", expand=False)
+    raw = raw.dropna().str.split(",").explode()
+    values = pd.to_numeric(raw, errors="coerce")
+    keep = values.notna().to_numpy()
+    return values.to_numpy(dtype=float)[keep], raw.index.to_numpy()[keep]
+
+
+def format_field(chunk, key, n_samples, convert=None):
+    """
+    Pull one FORMAT key out of every sample column of a chunk. Rows are grouped by their FORMAT
+    string (there are usually only a handful of different ones), and all of a group's sample
+    cells are split in one bulk operation. Returns a samples x rows float32 matrix, NaN where
+    missing. convert turns a Series of the raw strings into numbers (default: pd.to_numeric).
+    """
+    if convert is None:
+        convert = lambda raw: pd.to_numeric(raw, errors="coerce")
+    matrix = np.full((n_samples, len(chunk)), np.nan, dtype=np.float32)
+    n_columns = min(n_samples, chunk.shape[1] - FORMAT_COLUMN - 1)
+    if n_columns <= 0:
+        return matrix
+    for layout, rows in chunk.groupby(FORMAT_COLUMN, sort=False).indices.items():
+        keys = layout.split(":")
+        if key not in keys:
+            continue
+        i = keys.index(key)
+        # Every sample's cell for these rows, sample by sample, as one long Series
+        cells = chunk.iloc[rows, FORMAT_COLUMN + 1:FORMAT_COLUMN + 1 + n_columns].to_numpy()
+        cells = pd.Series(cells.ravel(order="F"))
+        values = convert(cells.str.split(":", n=i + 1).str[i])
+        matrix[:n_columns, rows] = np.asarray(values, dtype=np.float32).reshape(n_columns, len(rows))
+    return matrix
+
+
+def gt_dosage(gt):
+    # Number of non-reference alleles in one GT string (0/1 -> 1, 1|1 -> 2), NaN if any are missing
+    alleles = gt.replace("|", "/").split("/")
+    if any(not allele.isdigit() for allele in alleles):
+        return np.nan
+    return float(sum(allele != "0" for allele in alleles))
+
+
+def gt_dosages(raw):
+    # Dosages for a Series of GT strings. There are only a few distinct ones, so each is worked
+    # out once and then looked up
+    raw = raw.fillna(".")
+    distinct = raw.unique()
+    return raw.map(dict((gt, gt_dosage(gt)) for gt in distinct)).to_numpy(dtype=float)
+
+
+def genotype_dosages(chunk, n_samples):
+    # Samples x rows matrix of non-reference allele counts from the GT field, NaN where missing
+    return format_field(chunk, "GT", n_samples, convert=gt_dosages)
+
+
+def read_columns(filename, info_keys=(), format_keys=(), chunk_size=100000):
+    """
+    Extract INFO and FORMAT fields by name from a whole VCF file, a chunk at a time. Returns a
+    VCFColumns with per-value INFO arrays (plus the variant index of each value) and a
+    samples x variants matrix for each FORMAT key.
+    """
+    # VCFReader parses the header; pandas reads everything after it
+    with VCFReader(filename) as reader:
+        samples = reader.samples
+        header_lines = reader.header_lines
+    n_samples = len(samples)
+
+    info = {key: [] for key in info_keys}
+    info_index = {key: [] for key in info_keys}
+    format = {key: [] for key in format_keys}
+    n_variants = 0
+
+    for chunk in read_chunks(filename, header_lines, chunk_size):
+        for key in info_keys:
+            values, index = info_field(chunk[INFO_COLUMN], key)
+            info[key].append(values)
+            info_index[key].append(index + n_variants)
+        for key in format_keys:
+            format[key].append(format_field(chunk, key, n_samples))
+        n_variants += len(chunk)
+
+    return VCFColumns(
+        samples,
+        {key: np.concatenate(info[key] or [np.zeros(0)]) for key in info_keys},
+        {key: np.concatenate(info_index[key] or [np.zeros(0, dtype=np.int64)]) for key in info_keys},
+        {key: np.concatenate(format[key], axis=1) if format[key] else
+              np.zeros((n_samples, 0), dtype=np.float32) for key in format_keys},
+        n_variants)
+
+
+def info_histogram(filename, key, edges, chunk_size=100000):
+    """
+    Histogram of one INFO key over a whole VCF file, binned a chunk at a time. Returns the count
+    in each bin (np.histogram's rule: the last bin includes its right edge); values outside the
+    edges aren't counted. Histograms with the same edges can be added together.
+    """
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    with VCFReader(filename) as reader:
+        header_lines = reader.header_lines
+    for chunk in read_chunks(filename, header_lines, chunk_size):
+        values, index = info_field(chunk[INFO_COLUMN], key)
+        counts += np.histogram(values, bins=edges)[0]
+    return counts
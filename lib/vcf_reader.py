@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+"""
+Streaming VCF reader. Reads the original VCF file directly (plain text or bgzip/gzip), so there's
+no need to strip the ## lines off first.
+
+The ## meta lines are parsed into a schema:
+
+reader.meta     - Every ##key=value line, as {key: [value, ...]}
+reader.info     - ##INFO definitions, as {ID: {"Number": ..., "Type": ..., "Description": ...}}
+reader.format   - ##FORMAT definitions, in the same form
+reader.samples  - Sample names from the #CHROM line
+
+Records are read one line at a time and can be handed out in batches. The INFO and FORMAT
+columns are kept as raw strings and only parsed (and converted to the type in the schema) when
+a key is asked for, so pulling out one or two fields never builds the whole record.
+
+Example:
+    reader = VCFReader("snpeff.vcf.gz")
+    for batch in reader.batches(10000):
+        for record in batch:
+            record.info_value("AF")      # e.g. [0.5] (Number=A, so always a list)
+            record.info_value("DP")      # e.g. 20
+            record.info_list("DP")       # e.g. [20], for any Number
+            record.sample_values("GQ")   # one value per sample, None where missing
+"""
+
+import gzip
+import itertools
+
+# How to convert each VCF Type. Flags have no value; they're True when present
+CONVERTERS = {"Integer": int, "Float": float, "String": str, "Character": str}
+
+
+def open_vcf(filename):
+    # bgzip files are gzip files, so the gzip module can read them; check the magic bytes
+    with open(filename, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filename, "rt")
+    return open(filename)
+
+
+def parse_meta_value(value):
+    # <ID=AF,Number=A,Type=Float,Description="Allele frequency, for each ALT allele">
+    if not (value.startswith("<") and value.endswith(">")):
+        return value
+    fields = {}
+    key = []
+    current = []
+    in_key = True
+    in_quotes = False
+    for char in value[1:-1]:
+        if in_key:
+            if char == "=":
+                in_key = False
+            else:
+                key.append(char)
+        elif char == '"':
+            in_quotes = not in_quotes
+        elif char == "," and not in_quotes:
+            fields["".join(key)] = "".join(current)
+            key = []
+            current = []
+            in_key = True
+        else:
+            current.append(char)
+    if key:
+        fields["".join(key)] = "".join(current)
+    return fields
+
+
+def convert(raw, definition):
+    """
+    Convert one raw INFO/FORMAT value using its ##INFO/##FORMAT definition. Fields with
+    Number=1 (or 0) give a single value; everything else gives a list. Missing values (.) are
+    None. Keys with no definition are left as strings.
+    """
+    if definition is None:
+        return raw
+    if definition.get("Type") == "Flag":
+        return True
+    converter = CONVERTERS.get(definition.get("Type"), str)
+    values = [None if x in (".", "") else converter(x) for x in raw.split(",")]
+    if definition.get("Number") in ("0", "1"):
+        return values[0]
+    return values
+
+
+class VCFRecord(object):
+    # __slots__ keeps each record small when reading in big batches
+    __slots__ = ["reader", "chrom", "pos", "id", "ref", "alt", "qual", "filter",
+                 "raw_info", "raw_format", "raw_samples", "_info", "_format_keys"]
+
+    def __init__(self, reader, fields):
+        self.reader = reader
+        self.chrom = fields[0]
+        self.pos = int(fields[1])
+        self.id = fields[2]
+        self.ref = fields[3]
+        self.alt = fields[4].split(",")
+        self.qual = None if fields[5] == "." else float(fields[5])
+        self.filter = fields[6]
+        self.raw_info = fields[7] if len(fields) > 7 else "."
+        self.raw_format = fields[8] if len(fields) > 8 else None
+        self.raw_samples = fields[9:]
+        self._info = None
+        self._format_keys = None
+
+    def raw_info_value(self, key):
+        # The raw string for one INFO key (True for flags, None if the key isn't there)
+        if self._info is None:
+            self._info = {}
+            if self.raw_info != ".":
+                for item in self.raw_info.split(";"):
+                    name, equals, value = item.partition("=")
+                    self._info[name] = value if equals else True
+        return self._info.get(key)
+
+    def info_value(self, key):
+        # One INFO value, converted to the type in the ##INFO header
+        raw = self.raw_info_value(key)
+        if raw is None or raw is True:
+            return raw
+        return convert(raw, self.reader.info.get(key))
+
+    def info_list(self, key):
+        # One INFO value as a list, whatever its Number is (empty if the key isn't there)
+        raw = self.raw_info_value(key)
+        if raw is None or raw is True:
+            return []
+        definition = self.reader.info.get(key) or {}
+        converter = CONVERTERS.get(definition.get("Type"), str)
+        return [None if x in (".", "") else converter(x) for x in raw.split(",")]
+
+    def sample_values(self, key):
+        # One FORMAT field for every sample, converted to the type in the ##FORMAT header
+        if self.raw_format is None:
+            return [None] * len(self.raw_samples)
+        if self._format_keys is None:
+            self._format_keys = self.raw_format.split(":")
+        if key not in self._format_keys:
+            return [None] * len(self.raw_samples)
+        i = self._format_keys.index(key)
+        definition = self.reader.format.get(key)
+        values = []
+        for sample in self.raw_samples:
+            fields = sample.split(":")
+            values.append(convert(fields[i], definition) if i < len(fields) else None)
+        return values
+
+
+class VCFReader(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open_vcf(filename)
+        self.meta = {}
+        self.info = {}
+        self.format = {}
+        self.samples = []
+        self.columns = []
+        # A file with no #CHROM line starts straight in on records; save the first one
+        self.first_line = None
+        # Number of header lines, for readers that want to skip straight to the records
+        self.header_lines = 0
+
+        # Read the header up to and including the #CHROM line
+        for line in self.file:
+            if not line.startswith("#"):
+                self.first_line = line
+                break
+            self.header_lines += 1
+            line = line.rstrip("\r\n")
+            if line.startswith("##"):
+                key, equals, value = line[2:].partition("=")
+                value = parse_meta_value(value)
+                self.meta.setdefault(key, []).append(value)
+                if key in ("INFO", "FORMAT") and isinstance(value, dict) and "ID" in value:
+                    getattr(self, key.lower())[value["ID"]] = value
+            elif line.startswith("#"):
+                self.columns = line[1:].split("\t")
+                self.samples = self.columns[9:]
+                break
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self, chromosomes=None, exclude=None):
+        # Every record, only those on the given chromosomes, or all but those on the exclude
+        # chromosomes. Other chromosomes' lines are skipped on their first column, without being
+        # split into records
+        if chromosomes is not None:
+            prefixes = tuple(chrom + "\t" for chrom in chromosomes)
+        if exclude is not None:
+            excluded = tuple(chrom + "\t" for chrom in exclude)
+        if self.first_line is not None:
+            lines = itertools.chain([self.first_line], self.file)
+            self.first_line = None
+        else:
+            lines = self.file
+        for line in lines:
+            if line.startswith("#") or not line.strip():
+                continue
+            if chromosomes is not None and not line.startswith(prefixes):
+                continue
+            if exclude is not None and line.startswith(excluded):
+                continue
+            yield VCFRecord(self, line.rstrip("\r\n").split("\t"))
+
+    def chromosomes(self):
+        # Chromosome names from the ##contig lines, in header order
+        return [value["ID"] for value in self.meta.get("contig", [])
+                if isinstance(value, dict) and "ID" in value]
+
+    def batches(self, size=10000, chromosomes=None):
+        # Records in lists of at most size, so memory use is bounded by the batch size
+        batch = []
+        for record in self.records(chromosomes):
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
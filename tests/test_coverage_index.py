@@ -0,0 +1,43 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week2"))
+import coverage_index
+
+
+def per_base_depth(starts, ends, length):
+    # Depth of every reference base, one alignment at a time
+    depth = np.zeros(length, dtype=np.int64)
+    for start, end in zip(starts, ends):
+        depth[max(start, 0):min(end, length)] += 1
+    return depth
+
+
+def runs(keep):
+    # (start, end) of every run of True
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(int), [0]])))
+    return edges[0::2].tolist(), edges[1::2].tolist()
+
+
+def test_coverage_matches_per_base_counting():
+    rng = np.random.default_rng(6)
+    for trial in range(20):
+        length = int(rng.integers(50, 2000))
+        n = int(rng.integers(0, 40))
+        starts = rng.integers(-20, length, n)
+        ends = starts + rng.integers(0, 300, n)
+        index = coverage_index.CoverageIndex(starts, ends, length)
+        depth = per_base_depth(starts, ends, length)
+
+        assert np.array_equal(index.depth_at(np.arange(length)), depth)
+        assert np.isclose(index.breadth(), np.mean(depth > 0))
+        assert np.isclose(index.mean_depth(), depth.mean())
+        histogram = index.depth_histogram()
+        assert np.array_equal(histogram, np.bincount(depth, minlength=len(histogram)))
+        assert [x.tolist() for x in index.gaps()] == list(runs(depth == 0))
+        assert [x.tolist() for x in index.duplicated()] == list(runs(depth > 1))
+        for start, end in rng.integers(0, length, (10, 2)):
+            start, end = min(start, end), max(start, end)
+            covered, mean = index.query(start, end)
+            assert covered == int(np.sum(depth[start:end] > 0))
+            assert np.isclose(mean, depth[start:end].mean() if end > start else 0.0)
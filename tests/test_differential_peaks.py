@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week6"))
+import differential_peaks
+
+
+def random_peaks(rng, n):
+    chroms = rng.choice(["chr1", "chr2"], n)
+    starts = rng.integers(0, 20000, n)
+    ends = starts + rng.integers(1, rng.choice([50, 500, 5000]), n)
+    return chroms, starts, ends
+
+
+def brute_force_matched(peaks, others, min_fraction):
+    # Best single-peak overlap of every peak, checked against every other peak
+    matched = []
+    for chrom, start, end in zip(*peaks):
+        best = 0
+        for other_chrom, other_start, other_end in zip(*others):
+            if other_chrom == chrom:
+                best = max(best, min(end, other_end) - max(start, other_start))
+        matched.append(best >= max(np.ceil(min_fraction * (end - start)), 1))
+    return np.array(matched, dtype=bool)
+
+
+def test_matched_agrees_with_pairwise_overlaps():
+    rng = np.random.default_rng(2)
+    for trial in range(15):
+        peaks_1 = random_peaks(rng, int(rng.integers(0, 120)))
+        peaks_2 = random_peaks(rng, int(rng.integers(0, 120)))
+        for min_fraction in (0.0, 0.3, 1.0):
+            assert np.array_equal(differential_peaks.matched(peaks_1, peaks_2, min_fraction),
+                                  brute_force_matched(peaks_1, peaks_2, min_fraction))
+
+
+def test_differential_sets(tmp_path):
+    peaks_1 = (np.array(["chr1", "chr1", "chr2"]), np.array([100, 500, 10]), np.array([200, 600, 50]))
+    peaks_2 = (np.array(["chr1", "chr2"]), np.array([150, 1000]), np.array([300, 1100]))
+    # The 50 bp overlap is half of chr1:100-200 but only a third of chr1:150-300, so the first
+    # peak is shared and the second is still gained (like bedtools intersect -f)
+    result = differential_peaks.differential(peaks_1, peaks_2, min_fraction=0.5)
+    assert result.summary() == {"lost": 2, "gained": 2, "shared": 1}
+    result.write_bed(str(tmp_path / "gained.bed"), "gained")
+    assert (tmp_path / "gained.bed").read_text() == "chr1\t150\t300\nchr2\t1000\t1100\n"
@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from fasta_index import IndexedFASTA
+
+
+def fasta_reader(filename):
+    # What fasta.FASTAReader gives: the whole header as ident, every sequence line joined
+    records = []
+    for line in open(filename):
+        line = line.rstrip("\n")
+        if line.startswith(">"):
+            records.append([line[1:], []])
+        elif records:
+            records[-1][1].append(line.strip())
+    return [(ident, "".join(lines)) for ident, lines in records]
+
+
+def test_iteration_keeps_whole_headers(tmp_path):
+    filename = tmp_path / "wrapped.fa"
+    filename.write_text(">NODE_1 length=10 cov=2.5\nACGT\nACGT\nAC\n>NODE_2\nGG\n")
+    with IndexedFASTA(str(filename)) as reader:
+        assert list(reader) == fasta_reader(str(filename))
+        assert [name for name, sequence in reader.views()] == ["NODE_1", "NODE_2"]
+        assert reader.fetch("NODE_1", 2, 7) == "GTACG"
+
+
+def test_ragged_lines_are_streamed(tmp_path):
+    # Lines of different lengths can't be indexed, but FASTAReader read them fine
+    filename = tmp_path / "ragged.fa"
+    filename.write_text(">seq1 first\nACG\nACGTAC\nA\n>seq2\nTT\nTTTT\n")
+    with IndexedFASTA(str(filename)) as reader:
+        assert list(reader) == fasta_reader(str(filename))
+        assert [(name, bytes(sequence)) for name, sequence in reader.views()] == \
+            [("seq1", b"ACGACGTACA"), ("seq2", b"TTTTTT")]
+        with pytest.raises(ValueError):
+            reader.fetch("seq1")
+    assert not os.path.exists(str(filename) + ".fai")
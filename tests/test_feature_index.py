@@ -0,0 +1,70 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week6"))
+import feature_index
+
+
+def test_read_bed_skips_header_lines(tmp_path):
+    # MACS _peaks.bed files start with a track line
+    filename = tmp_path / "peaks.bed"
+    filename.write_text('track name="MACS peaks" description="peaks"\n'
+                        "chr1\t10\t20\tpeak_1\t5\n"
+                        "browser position chr1:1-100\n"
+                        "# comment\n"
+                        "chr2\t50\t60\tpeak_2\t7\n")
+    chroms, starts, ends = feature_index.read_bed(str(filename))
+    assert chroms.tolist() == ["chr1", "chr2"]
+    assert starts.tolist() == [10, 50]
+    assert ends.tolist() == [20, 60]
+
+    chroms, starts, ends, names = feature_index.read_bed(str(filename), 4)
+    assert names.tolist() == ["peak_1", "peak_2"]
+
+
+def test_read_bed_only_header(tmp_path):
+    filename = tmp_path / "empty.bed"
+    filename.write_text("track name=empty\n")
+    chroms, starts, ends = feature_index.read_bed(str(filename))
+    assert len(chroms) == len(starts) == len(ends) == 0
+
+
+def brute_force_overlaps(index, chroms, starts, ends, mode):
+    # Every (interval, feature) pair, checked one by one
+    pairs = set()
+    for i in range(len(starts)):
+        end = starts[i] + 1 if mode == "start" else ends[i]
+        for j in range(len(index.starts)):
+            if index.chroms[j] != chroms[i]:
+                continue
+            if mode == "full":
+                overlap = index.starts[j] <= starts[i] and index.ends[j] >= end
+            else:
+                overlap = index.starts[j] < end and index.ends[j] > starts[i]
+            if overlap:
+                pairs.add((i, j))
+    return pairs
+
+
+def test_overlaps_match_brute_force():
+    rng = np.random.default_rng(1)
+    for trial in range(20):
+        n = int(rng.integers(1, 200))
+        chroms = rng.choice(["chr1", "chr2", "chr3"], n)
+        starts = rng.integers(0, 5000, n)
+        ends = starts + rng.integers(0, rng.choice([10, 100, 3000]), n)
+        # One feature covering a whole chromosome, like a "region" row
+        starts[0], ends[0] = 0, 10000
+        index = feature_index.FeatureIndex(chroms, starts, ends, rng.choice(["exon", "intron"], n))
+
+        q = int(rng.integers(1, 100))
+        query_chroms = rng.choice(["chr1", "chr2", "chr4"], q)
+        query_starts = rng.integers(0, 5000, q)
+        query_ends = query_starts + rng.integers(1, 200, q)
+        for mode in feature_index.MODES:
+            query, feature = index.overlaps(query_chroms, query_starts, query_ends, mode)
+            assert len(query) == len(set(zip(query.tolist(), feature.tolist())))
+            assert set(zip(query.tolist(), feature.tolist())) == \
+                brute_force_overlaps(index, query_chroms, query_starts, query_ends, mode)
+            # Ordered by interval, then feature start
+            assert np.all(np.diff(query) >= 0)
@@ -0,0 +1,85 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week4"))
+import genotype_pca
+
+# Dosage (copies of the .bed file's first allele) -> 2-bit .bed code; missing is 01
+BED_BITS = {2: 0b00, 1: 0b10, 0: 0b11, genotype_pca.MISSING: 0b01}
+
+
+def simulate(n_per_population=20, n_variants=600, seed=0):
+    # Three populations with their own allele frequencies, plus a few missing genotypes
+    rng = np.random.default_rng(seed)
+    ancestral = rng.uniform(0.1, 0.9, n_variants)
+    dosages = []
+    for population in range(3):
+        p = np.clip(ancestral + rng.normal(0, 0.15, n_variants), 0.01, 0.99)
+        dosages.append(rng.binomial(2, p, (n_per_population, n_variants)))
+    dosages = np.vstack(dosages).T.astype(np.int8)
+    dosages[rng.random(dosages.shape) < 0.01] = genotype_pca.MISSING
+    return dosages
+
+
+def write_vcf(filename, dosages):
+    gts = {0: "0/0", 1: "0/1", 2: "1/1", genotype_pca.MISSING: "./."}
+    with open(filename, "w") as out:
+        out.write("##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t" +
+                  "\t".join("s%d" % i for i in range(dosages.shape[1])) + "\n")
+        for i, row in enumerate(dosages):
+            out.write("chr1\t%d\t.\tA\tC\t50\tPASS\t.\tGT\t%s\n"
+                      % (i + 1, "\t".join(gts[int(x)] for x in row)))
+
+
+def write_bed(prefix, dosages):
+    n_variants, n_samples = dosages.shape
+    with open(prefix + ".fam", "w") as out:
+        for i in range(n_samples):
+            out.write("f%d s%d 0 0 0 -9\n" % (i, i))
+    with open(prefix + ".bim", "w") as out:
+        for i in range(n_variants):
+            # The first allele is ALT, so the .bed holds the same counts as the VCF
+            out.write("1 v%d 0 %d C A\n" % (i, i + 1))
+    padded = np.full((n_variants, (n_samples + 3) // 4 * 4), 0b00, dtype=np.uint8)
+    padded[:, :n_samples] = np.vectorize(BED_BITS.get)(dosages)
+    packed = (padded.reshape(n_variants, -1, 4) << (2 * np.arange(4))).sum(axis=2)
+    with open(prefix + ".bed", "wb") as out:
+        out.write(genotype_pca.BED_MAGIC + packed.astype(np.uint8).tobytes())
+
+
+def exact_pca(genotypes, n_components):
+    # Build K in full and take its exact eigendecomposition
+    z = np.vstack([genotype_pca.standardize(chunk) for chunk in genotypes.chunks()])
+    values, vectors = np.linalg.eigh(z.T.astype(float) @ z / len(z))
+    order = np.argsort(values)[::-1][:n_components]
+    return values[order], vectors[:, order]
+
+
+def test_formats_read_the_same_dosages(tmp_path):
+    dosages = simulate(n_per_population=7, n_variants=50)
+    write_vcf(str(tmp_path / "test.vcf"), dosages)
+    write_bed(str(tmp_path / "test"), dosages)
+    from_vcf = genotype_pca.open_genotypes(str(tmp_path / "test.vcf"))
+    from_bed = genotype_pca.open_genotypes(str(tmp_path / "test.bed"))
+    assert from_bed.iids == from_vcf.iids
+    vcf_chunks = np.vstack(list(from_vcf.chunks(chunk_size=16)))
+    bed_chunks = np.vstack(list(from_bed.chunks(chunk_size=16)))
+    assert np.array_equal(vcf_chunks, bed_chunks, equal_nan=True)
+    expected = np.where(dosages == genotype_pca.MISSING, np.nan, dosages)
+    assert np.array_equal(vcf_chunks, expected, equal_nan=True)
+
+
+def test_randomized_pca_matches_exact(tmp_path):
+    dosages = simulate()
+    write_vcf(str(tmp_path / "test.vcf"), dosages)
+    write_bed(str(tmp_path / "test"), dosages)
+    for path in (str(tmp_path / "test.vcf"), str(tmp_path / "test")):
+        genotypes = genotype_pca.open_genotypes(path)
+        exact_values, exact_vectors = exact_pca(genotypes, 2)
+        # The defaults are close; more power iterations converge on the exact answer
+        for power_iterations, tolerance in [(2, 1e-3), (6, 1e-5)]:
+            values, vectors = genotype_pca.randomized_pca(
+                genotypes, n_components=2, power_iterations=power_iterations, chunk_size=128)
+            assert np.allclose(values, exact_values, rtol=tolerance)
+            cosines = np.abs(np.sum(vectors * exact_vectors, axis=0))
+            assert np.all(cosines > 1 - tolerance)
@@ -0,0 +1,72 @@
+import os
+import sys
+import itertools
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "week8"))
+import motif_scan
+
+BACKGROUND = np.array([0.3, 0.2, 0.2, 0.3])
+
+
+def random_motif(rng, width, ident="M1"):
+    return motif_scan.Motif(ident, ident, rng.dirichlet(np.full(4, 0.5), width), nsites=20)
+
+
+def window_score(matrix, window):
+    # Score one window base by base
+    return sum(matrix[j, motif_scan.BASES.index(base)] for j, base in enumerate(window))
+
+
+def test_window_scores_match_direct_scoring():
+    rng = np.random.default_rng(3)
+    matrix = motif_scan.log_odds(random_motif(rng, 7), BACKGROUND)
+    sequence = "".join(rng.choice(list("ACGT"), 200))
+    scores = motif_scan.window_scores(motif_scan.one_hot(sequence), matrix)
+    assert scores.tolist() == [window_score(matrix, sequence[i:i + 7]) for i in range(194)]
+
+
+def test_score_distribution_matches_enumeration():
+    # Every one of the 4^5 sequences, weighted by its background probability
+    rng = np.random.default_rng(4)
+    matrix = motif_scan.log_odds(random_motif(rng, 5), BACKGROUND)
+    lowest, survival = motif_scan.score_distribution(matrix, BACKGROUND)
+    probability = np.zeros(len(survival))
+    for bases in itertools.product(range(4), repeat=5):
+        score = sum(matrix[j, base] for j, base in enumerate(bases))
+        probability[score - lowest] += np.prod(BACKGROUND[list(bases)])
+    assert np.allclose(survival, np.minimum(np.cumsum(probability[::-1])[::-1], 1.0))
+
+
+def reverse_complement(sequence):
+    return sequence.translate(str.maketrans("ACGTN", "TGCAN"))[::-1]
+
+
+def test_scan_matches_brute_force():
+    rng = np.random.default_rng(5)
+    motifs = [random_motif(rng, 6, "M1"), random_motif(rng, 4, "M2")]
+    scanner = motif_scan.Scanner(motifs, BACKGROUND, pvalue=0.01)
+    sequence = "".join(rng.choice(list("ACGTN"), 400, p=[0.24, 0.24, 0.24, 0.24, 0.04]))
+
+    expected = set()
+    for motif in motifs:
+        matrix = motif_scan.log_odds(motif, BACKGROUND)
+        lowest, survival = motif_scan.score_distribution(matrix, BACKGROUND)
+        for i in range(len(sequence) - motif.width + 1):
+            window = sequence[i:i + motif.width]
+            if "N" in window:
+                continue
+            for strand, bases in [("+", window), ("-", reverse_complement(window))]:
+                score = window_score(matrix, bases)
+                if survival[score - lowest] <= 0.01:
+                    expected.add((motif.id, 1000 + i, 1000 + i + motif.width, strand, score))
+
+    hits = scanner.scan("chr1", 1000, sequence)
+    assert expected
+    assert set((ident, start, end, strand, int(round(score * motif_scan.SCALE)))
+               for ident, start, end, strand, score, pvalue in hits) == expected
+
+
+def test_peak_coordinates():
+    assert motif_scan.peak_coordinates("chr19:1000-1200", 200) == ("chr19", 1000, 1200, "+")
+    assert motif_scan.peak_coordinates("chr19:1000-1200(-)", 200) == ("chr19", 1000, 1200, "-")
+    assert motif_scan.peak_coordinates("contig_7", 50) == ("contig_7", 0, 50, "+")
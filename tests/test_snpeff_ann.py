@@ -0,0 +1,29 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import snpeff_ann
+import startup
+
+ANN = "ANN=%s|%s|%s|gene|gene|transcript|t1|protein_coding|1/1|c.1A>C|||||"
+
+# Only chr1 is declared; chr2 and chrM records are on contigs the header doesn't list
+VCF = """##fileformat=VCFv4.2
+##contig=<ID=chr1,length=1000>
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\ts1\ts2
+chr1\t10\t.\tA\tC\t50\tPASS\t%s\tGT\t0/1\t0/0
+chr2\t20\t.\tG\tT\t50\tPASS\t%s\tGT\t1/1\t0/1
+chr1\t30\t.\tT\tG\t50\tPASS\t%s\tGT\t0/0\t0/1
+chrM\t40\t.\tC\tA\t50\tPASS\t%s\tGT\t./.\t1/1
+""" % (ANN % ("C", "missense_variant", "MODERATE"), ANN % ("T", "intron_variant", "MODIFIER"),
+       ANN % ("G", "synonymous_variant", "LOW"), ANN % ("A", "stop_gained", "HIGH"))
+
+
+def test_parallel_counts_equal_serial(tmp_path):
+    filename = tmp_path / "ann.vcf"
+    filename.write_text(VCF)
+    serial = snpeff_ann.count_annotations(str(filename))
+    assert serial.table()[1] and len(serial.effects) == 4
+    for workers in (2, 3):
+        with startup.process_pool(workers) as pool:
+            parallel = snpeff_ann.parallel_count_annotations(str(filename), pool, workers)
+        assert parallel.table() == serial.table()
@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import vcf_columns
+
+HEADER = """##fileformat=VCFv4.2
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\ts1\ts2
+"""
+
+
+def write_vcf(path, n_variants):
+    # Variant i has AF=i/10 (variant 4 has no AF, variant 5 has two) and GQ=i, 10 + i
+    lines = []
+    for i in range(n_variants):
+        if i == 4:
+            info = "DP=1"
+        elif i == 5:
+            info = "AF=0.5,0.6;DP=1"
+        else:
+            info = "DP=1;AF=%g" % (i / 10)
+        lines.append("chr1\t%d\t.\tA\tC\t50\tPASS\t%s\tGT:GQ\t0/1:%d\t1/1:%d\n"
+                     % (i + 1, info, i, 10 + i))
+    path.write_text(HEADER + "".join(lines))
+
+
+def test_read_columns_across_chunks(tmp_path):
+    filename = tmp_path / "test.vcf"
+    write_vcf(filename, 7)
+    one_chunk = vcf_columns.read_columns(str(filename), ["AF"], ["GQ"], chunk_size=100)
+    columns = vcf_columns.read_columns(str(filename), ["AF"], ["GQ"], chunk_size=3)
+
+    assert columns.n_variants == 7
+    assert columns.info_index["AF"].tolist() == [0, 1, 2, 3, 5, 5, 6]
+    assert np.allclose(columns.info["AF"], [0, 0.1, 0.2, 0.3, 0.5, 0.6, 0.6])
+    assert columns.format["GQ"].tolist() == [list(range(7)), list(range(10, 17))]
+    assert columns.info_index["AF"].tolist() == one_chunk.info_index["AF"].tolist()
+    assert np.array_equal(columns.format["GQ"], one_chunk.format["GQ"])
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./blast_to_fasta.py < <blast_output>
+Usage: ./blast_to_fasta.py [--outfmt "<format>"] [--unique] [--ungap] < <blast_output> > <output.fa>
 
-<blast_output> Filepath to BLAST output file. This should be a tabular file with ONLY 
-two fields: the subject seq-id (sseqid) and the aligned part of the subject sequence 
-(sseq).
+<blast_output> Filepath to BLAST output file. This should be a tabular (-outfmt 6 or 7) file that
+includes the subject seq-id (sseqid) and the aligned part of the subject sequence (sseq).
+--outfmt       The -outfmt string the BLAST file was made with (default: "6 sseqid sseq"). The
+               sseqid and sseq columns are found from it, so the file can have other columns too
+               ("std" counts as BLAST's 12 standard columns, e.g. "6 std sseq").
+--unique       Only keep the first hit for each subject seq-id
+--ungap        Strip alignment gaps (-) out of the subject sequences
 
 Here is the command line syntax to get this output:
   blastn -db nr -query week1_query.fa -evalue .0001 -num_alignments 1000 -ungapped -outfmt \
@@ -20,21 +24,79 @@ Here is the command line syntax to get this output:
 - -remote: Searches against the NCBI database
 
 The script takes this BLAST output and reformats it as a FASTA file where each header is the
-subject seq-id.
+subject seq-id. Lines without enough fields (and # comment lines from -outfmt 7) are skipped,
+and the number of skipped lines is reported on stderr.
 
 It outputs directly to the terminal and you will have to pipe it to a file yourself.
 """
 
 import sys
+import argparse
 
-# Split each line by tab and strip out line breaks
-# Print >subject sequence ID, line break, and subject sequence
+parser = argparse.ArgumentParser()
+parser.add_argument("--outfmt", default="6 sseqid sseq")
+parser.add_argument("--unique", action="store_true")
+parser.add_argument("--ungap", action="store_true")
+args = parser.parse_args()
+
+# Find the sseqid and sseq columns from the -outfmt spec. The first word is the format number
+fields = args.outfmt.split()
+if len(fields) < 2 or not fields[0].isdigit():
+    fields = ["6"] + fields
+# "std" (or no column names at all) stands for BLAST's 12 standard columns
+STD_COLUMNS = ["qseqid", "sseqid", "pident", "length", "mismatch", "gapopen",
+               "qstart", "qend", "sstart", "send", "evalue", "bitscore"]
+columns = []
+for column in fields[1:] or ["std"]:
+    columns += STD_COLUMNS if column == "std" else [column]
+if "sseqid" not in columns or "sseq" not in columns:
+    sys.exit("-outfmt must include both sseqid and sseq: " + args.outfmt)
+id_col = columns.index("sseqid")
+seq_col = columns.index("sseq")
+n_cols = max(id_col, seq_col) + 1
+
+# Read stdin as raw bytes in big blocks and write through one big buffer
+# Print >subject sequence ID, line break, subject sequence, and a blank line
 # You will have to pipe the output to a file destination yourself
-for line in sys.stdin:
-    split_line = line.rstrip("\r\n").split("\t")
-    print(">" + split_line[0] + "\n" + split_line[1] + "\n")
-    
-    
+BLOCK_SIZE = 1 << 22
+stdin = sys.stdin.buffer
+stdout = open(sys.stdout.fileno(), "wb", buffering=BLOCK_SIZE, closefd=False)
+
+seen = set()
+skipped = 0
+leftover = b""
+while True:
+    block = stdin.read(BLOCK_SIZE)
+    # The last line of a block is usually cut off, so save it for the next block
+    lines = (leftover + block).split(b"\n")
+    leftover = lines.pop() if block else b""
+
+    records = []
+    for line in lines:
+        split_line = line.rstrip(b"\r").split(b"\t")
+        if len(split_line) < n_cols or line.startswith(b"#"):
+            if line.strip():
+                skipped += 1
+            continue
+        ident = split_line[id_col]
+        if args.unique:
+            if ident in seen:
+                continue
+            seen.add(ident)
+        sequence = split_line[seq_col]
+        if args.ungap:
+            sequence = sequence.replace(b"-", b"")
+        records.append(b">" + ident + b"\n" + sequence + b"\n\n")
+    stdout.write(b"".join(records))
+
+    if not block:
+        break
+
+stdout.flush()
+if skipped:
+    print("Skipped " + str(skipped) + " lines without sseqid and sseq fields", file=sys.stderr)
+
+
 # To translate the new BLAST.fa file to amino acids, use transeq from emboss in command line:
 # transeq <BLAST.fa> <output name>
 
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+"""
+Vectorized codon-gapping and synonymous/nonsynonymous counting for nuc_align_list.py.
+
+Instead of building a list of 3-character codon strings for every alignment and comparing them
+one at a time, every alignment is stored as a NumPy uint8 array:
+
+aas    - (# of sequences) x (alignment length) matrix of amino acid characters
+codons - (# of sequences) x (alignment length) x 3 matrix of codon characters
+
+Codons that run past the end of a BLAST sequence are padded with 0 bytes, which never occur in
+a FASTA file. That way two padded codons are equal exactly when the original codon strings
+were equal, so the counts match the old loop-based version exactly.
+"""
+
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from fasta_index import IndexedFASTA
+import startup
+
+GAP = ord("-")
+
+
+def encode(sequence):
+    # Accept str, bytes, or a memoryview straight from IndexedFASTA
+    if isinstance(sequence, str):
+        sequence = sequence.encode("ascii")
+    return np.frombuffer(sequence, dtype=np.uint8)
+
+
+def gap_alignments(pairs, length=None):
+    """
+    PART 1, in bulk. pairs is a list of (nucleotide sequence, amino acid alignment) tuples.
+    Wherever there is a gap in the AA alignment, the codon becomes "---"; otherwise it is the
+    next unused codon from the nucleotide sequence.
+
+    Returns (codons, aas, valid). valid marks the positions that exist in each alignment, for
+    alignments that are shorter than length (which defaults to the longest alignment).
+    """
+    aa_arrays = [encode(aa) for dna, aa in pairs]
+    dna_arrays = [encode(dna) for dna, aa in pairs]
+    if length is None:
+        length = max([len(aa) for aa in aa_arrays] + [0])
+    n = len(pairs)
+
+    # Pack the ragged sequences into rectangular matrices, padded with 0
+    aas = np.zeros((n, length), dtype=np.uint8)
+    dna = np.zeros((n, length * 3), dtype=np.uint8)
+    valid = np.zeros((n, length), dtype=bool)
+    for i, (aa, nucs) in enumerate(zip(aa_arrays, dna_arrays)):
+        if len(aa) > length:
+            raise ValueError("Alignment %d is longer than the query alignment" % i)
+        aas[i, :len(aa)] = aa
+        valid[i, :len(aa)] = True
+        # There can never be more codons than AA positions, so anything past that is unused
+        nucs = nucs[:length * 3]
+        dna[i, :len(nucs)] = nucs
+
+    # The nth non-gap AA in an alignment uses the nth codon of its nucleotide sequence
+    not_gap = (aas != GAP) & valid
+    rank = np.cumsum(not_gap, axis=1) - 1
+    np.maximum(rank, 0, out=rank)
+    codons = dna.reshape(n, length, 3)[np.arange(n)[:, None], rank]
+    # Gap positions get a --- codon instead
+    codons[~not_gap & valid] = GAP
+    codons[~valid] = 0
+
+    return codons, aas, valid
+
+
+def count_changes(query_codons, query_aas, codons, aas, valid):
+    """
+    PART 2 for a block of subject alignments against the query alignment.
+
+    Returns (dS, dN, count, count_indels): per-position counts of synonymous changes,
+    nonsynonymous changes and all changes, plus the number of subject positions skipped
+    because the query codon is an indel. Blocks can be counted separately and the results
+    added together.
+    """
+    length = len(query_aas)
+    codons = codons[:, :length]
+    aas = aas[:, :length]
+    valid = valid[:, :length]
+
+    # Positions where the query codon is an indel are skipped
+    query_indel = np.all(query_codons == GAP, axis=1)
+    usable = valid & ~query_indel
+    count_indels = int(np.count_nonzero(valid & query_indel))
+
+    # A change is any subject codon that differs from the query codon
+    changed = np.any(codons != query_codons, axis=2) & usable
+    synonymous = changed & (aas == query_aas)
+
+    count = changed.sum(axis=0)
+    dS = synonymous.sum(axis=0)
+    dN = count - dS
+    return dS, dN, count, count_indels
+
+
+def stream_counts(pairs):
+    """
+    Streaming version of PART 1 and PART 2. pairs can be any iterator of (nucleotide
+    sequence, amino acid alignment) tuples, e.g. zip() over two IndexedFASTA.views(). The first
+    pair is the query; every later pair is gapped, counted and thrown away before the next one
+    is read, so memory stays flat no matter how many BLAST hits there are.
+
+    Returns (dS, dN, count, count_indels, # of alignments, query length).
+    """
+    pairs = iter(pairs)
+    query = next(pairs, None)
+    if query is None:
+        raise ValueError("No alignments to count")
+    query_length = len(query[1])
+    query_codons, query_aas, query_valid = gap_alignments([query], query_length)
+    query_codons = query_codons[0]
+    query_aas = query_aas[0]
+
+    dS = np.zeros(query_length, dtype=np.int64)
+    dN = np.zeros(query_length, dtype=np.int64)
+    count = np.zeros(query_length, dtype=np.int64)
+    count_indels = 0
+    n_alignments = 1
+
+    for pair in pairs:
+        codons, aas, valid = gap_alignments([pair], query_length)
+        pair_dS, pair_dN, pair_count, pair_indels = count_changes(
+            query_codons, query_aas, codons, aas, valid)
+        dS += pair_dS
+        dN += pair_dN
+        count += pair_count
+        count_indels += pair_indels
+        n_alignments += 1
+
+    return dS, dN, count, count_indels, n_alignments, query_length
+
+
+# Each worker process opens its own IndexedFASTA readers for a gene and gaps its query once,
+# then keeps them here so every shard it is handed only has to name a range of record numbers.
+# Only the most recent few genes are kept so batch runs don't pile up open files
+worker_genes = {}
+MAX_WORKER_GENES = 8
+
+
+def open_gene(blast_filename, mafft_filename):
+    key = (blast_filename, mafft_filename)
+    if key not in worker_genes:
+        if len(worker_genes) >= MAX_WORKER_GENES:
+            old_key = next(iter(worker_genes))
+            old_blast, old_mafft, old_query = worker_genes.pop(old_key)
+            old_blast.close()
+            old_mafft.close()
+        blast = IndexedFASTA(blast_filename)
+        mafft = IndexedFASTA(mafft_filename)
+        query = (blast.view(0), mafft.view(0))
+        query_length = len(query[1])
+        query_codons, query_aas, query_valid = gap_alignments([query], query_length)
+        worker_genes[key] = (blast, mafft, (query_codons[0], query_aas[0], query_length))
+    return worker_genes[key]
+
+
+def count_shard(shard):
+    # Gap and count subject records [start, stop) of one gene in one vectorized block
+    gene, blast_filename, mafft_filename, start, stop = shard
+    blast, mafft, (query_codons, query_aas, query_length) = open_gene(blast_filename, mafft_filename)
+    pairs = [(blast.view(i), mafft.view(i)) for i in range(start, stop)]
+    codons, aas, valid = gap_alignments(pairs, query_length)
+    return (gene,) + count_changes(query_codons, query_aas, codons, aas, valid)
+
+
+def parallel_gene_counts(genes, pool, shard_size=500):
+    """
+    Process-pool version of PART 1 and PART 2 for any number of genes. genes is a list of
+    (BLAST filename, MAFFT filename) pairs. Every gene's subject alignments are split into
+    shards of shard_size records, and the shards of all genes share one pool, so the workers
+    stay busy across gene boundaries. Each worker sends back partial per-position vectors,
+    which are added together here.
+
+    Returns one (dS, dN, count, count_indels, # of alignments, query length) tuple per gene,
+    in the same order as genes.
+    """
+    results = []
+    shards = []
+    for gene, (blast_filename, mafft_filename) in enumerate(genes):
+        # Like zip(), stop at the end of the shorter file
+        with IndexedFASTA(blast_filename) as blast, IndexedFASTA(mafft_filename) as mafft:
+            n_alignments = min(len(blast), len(mafft))
+            if n_alignments == 0:
+                raise ValueError("No alignments to count in " + mafft_filename)
+            query_length = len(mafft.view(0))
+        results.append([np.zeros(query_length, dtype=np.int64),
+                        np.zeros(query_length, dtype=np.int64),
+                        np.zeros(query_length, dtype=np.int64),
+                        0, n_alignments, query_length])
+        for start in range(1, n_alignments, shard_size):
+            shards.append((gene, blast_filename, mafft_filename,
+                           start, min(start + shard_size, n_alignments)))
+
+    for gene, shard_dS, shard_dN, shard_count, shard_indels in pool.imap_unordered(count_shard, shards):
+        result = results[gene]
+        result[0] += shard_dS
+        result[1] += shard_dN
+        result[2] += shard_count
+        result[3] += shard_indels
+
+    return [tuple(result) for result in results]
+
+
+def parallel_counts(blast_filename, mafft_filename, workers, shard_size=500):
+    # Single-gene shortcut for nuc_align_list.py --workers N
+    with startup.process_pool(workers) as pool:
+        return parallel_gene_counts([(blast_filename, mafft_filename)], pool, shard_size)[0]
+
+
+def selection_stats(dS, dN, count):
+    """
+    PART 3. Z-test each dN - dS value against the null hypothesis dN - dS = 0 (no selection).
+
+    z = (dN - dS) / (std of all dN - dS values / sqrt(# of changes at that position))
+
+    Returns (difference, ratio, z, positive). ratio is dN / (dS + 1), z is NaN at positions
+    with no changes, and positive marks positions with z < -3.29 (p < 0.001).
+    """
+    dS = np.asarray(dS)
+    dN = np.asarray(dN)
+    count = np.asarray(count)
+    difference = dN - dS
+    # Adding 1 to the denominator avoids dividing by 0
+    ratio = dN / (dS + 1)
+
+    z = np.full(len(difference), np.nan)
+    changed = count > 0
+    stderror = np.std(difference) / np.sqrt(count[changed])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z[changed] = difference[changed] / stderror
+    positive = changed & (z < -3.29)
+    return difference, ratio, z, positive
+
+
+SELECTION_HEADER = ["position", "dS", "dN", "count", "difference", "ratio", "z", "selection"]
+
+
+def selection_columns(dS, dN, count, difference, ratio, z, positive):
+    """
+    Table columns (see SELECTION_HEADER) for one gene's counts and PART 3 results. selection is
+    "positive" for sites with z < -3.29, "none" for other sites with changes, and "NA" for sites
+    with no changes (which also have z = NA).
+    """
+    count = np.asarray(count)
+    selection = np.where(positive, "positive", np.where(count > 0, "none", "NA"))
+    z_column = np.where(count > 0, np.char.mod("%g", z), "NA")
+    return [np.arange(len(count)), dS, dN, count, difference, np.char.mod("%g", ratio),
+            z_column, selection]
+
+
+def plot_selection(filename, ratio, count, positive, title=None):
+    """
+    PART 4. Plot log(dN/dS) vs. codon position for every position with changes, coloring
+    sites under positive selection. matplotlib is only imported once a plot is asked for.
+    """
+    plt = startup.pyplot()
+
+    positions = np.arange(len(ratio))
+    other = (count > 0) & ~positive
+    with np.errstate(divide="ignore"):
+        log_ratio = np.log(ratio)
+
+    fig, ax = plt.subplots(figsize=(20, 8))
+    ax.scatter( positions[positive], log_ratio[positive],
+                alpha=1, s=6, color="mediumvioletred", label="Positive selection"
+                )
+    ax.scatter( positions[other], log_ratio[other],
+                alpha=1, s=6, color="royalblue", label="Negative or no selection"
+                )
+    ax.set_xlabel("Codon position")
+    ax.set_ylabel("log(dN/dS ratio)")
+    ax.set_title(title or "Ratio of nonsynonymous to synonymous changes at each codon")
+    ax.legend(bbox_to_anchor=(1.01,0.52), loc=2, borderaxespad=0.)
+    plt.tight_layout()
+    fig.savefig(filename)
+    plt.close(fig)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./selection_scan.py [--workers N] [--plots <directory>] <manifest> <output table>
+
+<manifest>     Tab-separated file with one gene per line: <gene name> <BLAST FASTA> <MAFFT FASTA>.
+               The gene name can be left out, in which case the BLAST file name is used.
+<output table> Where to write the per-codon results for every gene
+--workers N    Number of worker processes shared by all of the genes (default: all CPUs)
+--plots        Also make a dN/dS plot for each gene (<directory>/<gene>_dN_dS.png). Plotting
+               happens after the whole table has been written.
+
+Runs the nuc_align_list.py selection analysis on many genes in one process. The output table
+has one row per codon position of every gene, with these tab-separated columns:
+
+gene, position, dS, dN, count, difference (dN - dS), ratio (dN/(dS + 1)), z, selection
+
+selection is "positive" for sites with z < -3.29 (p < 0.001), "none" for other sites with
+changes, and "NA" for sites with no changes (which also have z = NA).
+"""
+
+import os
+import sys
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+import dnds
+
+parser = argparse.ArgumentParser()
+parser.add_argument("manifest")
+parser.add_argument("output")
+parser.add_argument("--workers", type=int, default=os.cpu_count())
+parser.add_argument("--plots")
+args = parser.parse_args()
+
+# Read the manifest of (gene, BLAST FASTA, MAFFT FASTA)
+names = []
+genes = []
+for line in open(args.manifest):
+    fields = line.rstrip("\r\n").split("\t")
+    if line.startswith("#") or fields == [""]:
+        continue
+    if len(fields) == 2:
+        fields = [os.path.basename(fields[0]).split(".")[0]] + fields
+    names.append(fields[0])
+    genes.append((fields[1], fields[2]))
+
+# Count every gene's changes with one shared pool
+with startup.process_pool(args.workers) as pool:
+    results = dnds.parallel_gene_counts(genes, pool)
+
+# Write one table for all genes, a whole gene at a time
+stats = []
+out = open(args.output, "w")
+out.write("\t".join(["gene"] + dnds.SELECTION_HEADER) + "\n")
+for name, (dS, dN, count, count_indels, num_aligns, query_length) in zip(names, results):
+    difference, ratio, z, positive = dnds.selection_stats(dS, dN, count)
+    stats.append((name, ratio, count, positive))
+
+    columns = dnds.selection_columns(dS, dN, count, difference, ratio, z, positive)
+    rows = ["\t".join([name] + [str(x) for x in row]) for row in zip(*columns)]
+    if rows:
+        out.write("\n".join(rows) + "\n")
+    print(name + ": " + str(num_aligns) + " alignments, " + str(int(positive.sum())) +
+          " sites under positive selection", file=sys.stderr)
+out.close()
+
+# Plots are optional, and only done once all of the numbers are written out
+if args.plots:
+    os.makedirs(args.plots, exist_ok=True)
+    for name, ratio, count, positive in stats:
+        dnds.plot_selection(os.path.join(args.plots, name + "_dN_dS.png"), ratio, count,
+                            positive, title=name + ": ratio of nonsynonymous to synonymous changes at each codon")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""
+Assembly statistics for count_contigs.py.
+
+Contig lengths are read from the FASTA file's .fai index (see lib/fasta_index.py) into a compact
+int64 NumPy array, so even assemblies with tens of millions of contigs only take 8 bytes per
+contig. Everything else comes from one descending sort and one cumulative sum of that array:
+
+Nx  - Length of the shortest contig in the smallest set of contigs (longest first) that covers
+      x% of the total assembly length. N50 is the usual one.
+Lx  - Number of contigs in that set
+NGx - Same as Nx, but covering x% of a given genome size instead of the assembly length
+LGx - Number of contigs in that set
+auN - Area under the Nx curve: sum of squared contig lengths / total length. This is the
+      expected length of the contig that a random base of the assembly falls in.
+
+Length arrays can also be cached as .npy files in a cache directory, keyed by the assembly's
+absolute path and modification time, so rerunning a comparison doesn't even read the index.
+"""
+
+import os
+import sys
+import hashlib
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from fasta_index import IndexedFASTA, ensure_index
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qbb2018-answers", "contig_lengths")
+
+
+def read_lengths(filename):
+    # Build (or reuse) the .fai index, then read just the length column out of it. If the index
+    # can't be written next to the assembly (e.g. a read-only directory), index it in memory
+    try:
+        index_filename = ensure_index(filename)
+    except OSError:
+        with IndexedFASTA(filename) as reader:
+            return np.array(reader.lengths(), dtype=np.int64)
+    with open(index_filename) as f:
+        return np.fromiter((int(line.split("\t", 2)[1]) for line in f), dtype=np.int64)
+
+
+def cached_lengths(filename, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    read_lengths(), but cached on disk. The cache file name is a hash of the absolute path and
+    the modification time, so editing or replacing the assembly automatically misses the cache.
+    """
+    path = os.path.abspath(filename)
+    key = hashlib.sha1((path + "\t" + str(os.stat(path).st_mtime_ns)).encode()).hexdigest()
+    cache_filename = os.path.join(cache_dir, key + ".npy")
+    if os.path.exists(cache_filename):
+        return np.load(cache_filename)
+
+    lengths = read_lengths(filename)
+    # Caching is just a speedup, so carry on without it if the cache directory isn't writable
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_filename = cache_filename + ".%d.tmp" % os.getpid()
+        with open(temp_filename, "wb") as f:
+            np.save(f, lengths)
+        os.replace(temp_filename, cache_filename)
+    except OSError:
+        pass
+    return lengths
+
+
+def nx(lengths, xs, total=None):
+    """
+    Nx and Lx for every x in xs, from lengths that are already sorted longest first. total is
+    the length to take x% of (the assembly length, or a genome size for NGx/LGx). Returns a
+    list of (Nx, Lx) tuples, with (None, None) where the contigs don't add up to x% of total.
+    """
+    cumulative = np.cumsum(lengths)
+    if total is None:
+        total = cumulative[-1] if len(cumulative) else 0
+    thresholds = np.asarray(xs, dtype=float) / 100 * total
+    # The first contig where the running total reaches x% of the total length
+    indices = np.searchsorted(cumulative, thresholds, side="left")
+    results = []
+    for i in indices:
+        if i < len(lengths):
+            results.append((int(lengths[i]), int(i + 1)))
+        else:
+            results.append((None, None))
+    return results
+
+
+def assembly_stats(lengths, xs=(50,), genome_size=None):
+    """
+    All of the statistics for one assembly, as a dict. Nx/Lx (and NGx/LGx, if genome_size is
+    given) are stored under keys like "N50", "L50", "NG50" and "LG50".
+    """
+    lengths = np.sort(np.asarray(lengths, dtype=np.int64))[::-1]
+    stats = {}
+    stats["contigs"] = len(lengths)
+    stats["total"] = int(lengths.sum())
+    stats["min"] = int(lengths[-1]) if len(lengths) else None
+    stats["max"] = int(lengths[0]) if len(lengths) else None
+    stats["mean"] = stats["total"] / len(lengths) if len(lengths) else None
+    # Square in floating point so huge contigs can't overflow int64
+    stats["auN"] = float(np.dot(lengths.astype(float), lengths)) / stats["total"] if stats["total"] else None
+
+    for x, (n, l) in zip(xs, nx(lengths, xs)):
+        stats["N%g" % x] = n
+        stats["L%g" % x] = l
+    if genome_size:
+        for x, (n, l) in zip(xs, nx(lengths, xs, genome_size)):
+            stats["NG%g" % x] = n
+            stats["LG%g" % x] = l
+    return stats
+
+
+def nx_curve(lengths, xs=np.arange(0, 101)):
+    # Nx for every x from 0 to 100, for plotting. x values with no Nx are NaN
+    lengths = np.sort(np.asarray(lengths, dtype=np.int64))[::-1]
+    return np.array([np.nan if n is None else n for n, l in nx(lengths, xs)])
+
+
+def summarize(job):
+    """
+    Everything count_contigs.py reports for one assembly. job is a (filename, xs, genome_size,
+    cache_dir) tuple so this can be handed straight to Pool.imap. Returns (stats, Nx curve).
+    """
+    filename, xs, genome_size, cache_dir = job
+    if cache_dir:
+        lengths = cached_lengths(filename, cache_dir)
+    else:
+        lengths = read_lengths(filename)
+    return assembly_stats(lengths, xs, genome_size), nx_curve(lengths)
+
+
+def format_stat(value):
+    # NA for statistics that can't be calculated (e.g. NG90 when the assembly is too short)
+    if value is None:
+        return "NA"
+    return str(value)
+
+
+def stat_names(xs=(50,), genome_size=None):
+    # The keys of assembly_stats(), in the order they should be reported
+    names = ["contigs", "total", "min", "max", "mean"]
+    for x in xs:
+        names += ["N%g" % x, "L%g" % x]
+    if genome_size:
+        for x in xs:
+            names += ["NG%g" % x, "LG%g" % x]
+    return names + ["auN"]
@@ -1,56 +1,101 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./count_contigs.py <contigs.fa>
+Usage: ./count_contigs.py [-x <x> ...] [--genome-size <bp>] [--workers N] [--cache-dir <dir> |
+                          --no-cache] [--no-plot] <contigs.fa> [<contigs2.fa> ...]
 
-<contigs.fa> FASTA-formatted output of a contig assembler
+<contigs.fa>   FASTA-formatted output of a contig assembler. Give several to compare assemblies.
+-x             Which Nx/Lx values to report (default: 50). Can be given more than once,
+               e.g. -x 50 -x 90
+--genome-size  Expected genome size, to also report NGx/LGx against it
+--workers N    Number of assemblies to process at once (default: all CPUs)
+--cache-dir    Where to cache each assembly's contig lengths (default:
+               ~/.cache/qbb2018-answers/contig_lengths). --no-cache turns caching off.
+--no-plot      With several assemblies, write the Nx curves to nx_curves.tsv instead of
+               plotting them in nx_curves.png
 
 Takes a contig assembly output file and returns total # of contigs; avg, min, and max contig
-lengths; and n50.
+lengths; total assembly length; Nx and Lx; NGx and LGx if a genome size is given; and auN.
+See assembly_stats.py for what each of these means.
+
+Given several assemblies, it processes them in parallel and prints one tab-separated comparison
+table instead, with one row per assembly, and plots every assembly's Nx curve on one plot.
 """
 
+import os
 import sys
-import fasta
-
-# Read contigs file
-contigs_file = fasta.FASTAReader(open(sys.argv[1]))
-
-# Calculate # of contigs and min, max, and avg contig length
-# Set counter for # of contigs and a list to record contig lengths
-num_contigs = 0
-contig_lengths = []
-
-for ident, sequence in contigs_file:
-    
-    # Increment contig counter for each new contig
-    num_contigs += 1
-    # Add contig length to list
-    contig_lengths.append(len(sequence))
-
-# Sort list of lengths (from largest to smallest, for the n50 calculation)
-contig_lengths.sort(reverse=True)
-print("Total # of contigs = " + str(num_contigs))
-print("Avg contig length = " + str(sum(contig_lengths)/num_contigs))
-print("Min contig length = " + str(contig_lengths[-1]))
-print("Max contig length = " + str(contig_lengths[0]))
-
-
-# Calculate n50
-# At least 50% of the genome is covered by contigs of minimum length n50
-# If the x longest contigs are the minimum requirement to cover 50% of the genome, n50 is the length of the xth contig
-
-# Calculate 50% of length of the genome, set counter for current position
-half_length = sum(contig_lengths)/2
-counter = 0
-
-for i, length in enumerate(contig_lengths):
-    
-    # If the current position is greater than the 50% position, print out the previous contig length
-    if counter >= half_length:
-        print("1/2 total sequence length = " + str(half_length))
-        print("Current position in sequence = " + str(counter))
-        print("n50 = " + str(contig_lengths[i-1]))
-        break
-    # Otherwise, add current contig length to the position count
+import argparse
+import numpy as np
+import assembly_stats
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("contigs", nargs="+")
+parser.add_argument("-x", type=float, action="append")
+parser.add_argument("--genome-size", type=int)
+parser.add_argument("--workers", type=int, default=os.cpu_count())
+parser.add_argument("--cache-dir", default=assembly_stats.DEFAULT_CACHE_DIR)
+parser.add_argument("--no-cache", action="store_true")
+parser.add_argument("--no-plot", action="store_true")
+args = parser.parse_args()
+xs = args.x or [50]
+cache_dir = None if args.no_cache else args.cache_dir
+
+# Contig lengths come from the cache or straight from the .fai index, so the sequences
+# themselves are never read. Everything is calculated from one sorted array of lengths
+jobs = [(filename, xs, args.genome_size, cache_dir) for filename in args.contigs]
+if len(jobs) == 1:
+    results = [assembly_stats.summarize(jobs[0])]
+else:
+    with startup.process_pool(min(args.workers, len(jobs))) as pool:
+        results = pool.map(assembly_stats.summarize, jobs)
+
+
+if len(results) == 1:
+    stats = results[0][0]
+    print("Total # of contigs = " + str(stats["contigs"]))
+    print("Avg contig length = " + assembly_stats.format_stat(stats["mean"]))
+    print("Min contig length = " + assembly_stats.format_stat(stats["min"]))
+    print("Max contig length = " + assembly_stats.format_stat(stats["max"]))
+    print("Total sequence length = " + str(stats["total"]))
+
+    # At least x% of the assembly is covered by contigs of minimum length Nx
+    # If the Lx longest contigs are the minimum requirement to cover x% of the assembly, Nx is the length of the Lx-th contig
+    for x in xs:
+        print("N%g = %s" % (x, assembly_stats.format_stat(stats["N%g" % x])))
+        print("L%g = %s" % (x, assembly_stats.format_stat(stats["L%g" % x])))
+
+    # Same thing, but against the expected genome size instead of the assembly length
+    if args.genome_size:
+        for x in xs:
+            print("NG%g = %s" % (x, assembly_stats.format_stat(stats["NG%g" % x])))
+            print("LG%g = %s" % (x, assembly_stats.format_stat(stats["LG%g" % x])))
+
+    print("auN = " + assembly_stats.format_stat(stats["auN"]))
+
+else:
+    # One comparison table, one row per assembly
+    names = assembly_stats.stat_names(xs, args.genome_size)
+    print("\t".join(["assembly"] + names))
+    for filename, (stats, curve) in zip(args.contigs, results):
+        print("\t".join([filename] + [assembly_stats.format_stat(stats[name]) for name in names]))
+
+    # Nx curves for every assembly
+    x_values = np.arange(0, 101)
+    if args.no_plot:
+        startup.write_table("nx_curves.tsv", ["x"] + args.contigs,
+                            [x_values] + [curve.tolist() for stats, curve in results])
     else:
-        counter += length
\ No newline at end of file
+        plt = startup.pyplot()
+        fig, ax = plt.subplots(figsize=(8, 5))
+        for filename, (stats, curve) in zip(args.contigs, results):
+            ax.step(x_values, curve, where="post", label=os.path.basename(filename))
+        ax.set_yscale("log")
+        ax.set_xlabel("x (%)")
+        ax.set_ylabel("Nx (bp)")
+        ax.set_title("Nx curves")
+        ax.legend()
+        plt.tight_layout()
+        fig.savefig("nx_curves.png")
+        plt.close(fig)
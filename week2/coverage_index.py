@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Reference coverage index for LASTZ alignments.
+
+For each reference sequence, every alignment's [zstart, zend) interval becomes a +1 event at
+zstart and a -1 event at zend. Sorting the events and taking a cumulative sum gives the depth of
+coverage as a step function:
+
+breakpoints - Sorted positions where the depth changes
+depth       - depth[i] is the depth on [breakpoints[i], breakpoints[i + 1])
+
+Prefix sums of covered bases and of depth x length over those steps let any range query be
+answered with two binary searches (np.searchsorted), i.e. in O(log n) time, without going back
+to the alignments.
+
+Example:
+    names, starts, ends = dotplot.read_lastz("lastz_velvet_sort.out")
+    index = CoverageIndex(starts[names == "ref"], ends[names == "ref"], length=100000)
+    index.breadth()              # fraction of the reference covered at least once
+    index.query(2000, 3000)      # (bases covered, mean depth) in that window
+    index.gaps(min_length=100)   # uncovered stretches
+    index.duplicated()           # stretches covered more than once
+"""
+
+import numpy as np
+
+
+class CoverageIndex(object):
+
+    def __init__(self, starts, ends, length=None):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        # Without a reference length, assume the reference ends where the last alignment does
+        if length is None:
+            length = int(ends.max()) if len(ends) else 0
+        self.length = length
+        # Anything hanging off the ends of the reference doesn't count
+        starts = np.clip(starts, 0, length)
+        ends = np.clip(ends, 0, length)
+
+        # Sweep line: +1 at every start, -1 at every end, summed in position order
+        positions = np.concatenate([[0], starts, ends, [length]])
+        changes = np.concatenate([[0], np.ones(len(starts), dtype=np.int64),
+                                  -np.ones(len(ends), dtype=np.int64), [0]])
+        order = np.argsort(positions, kind="stable")
+        positions = positions[order]
+        depth_after = np.cumsum(changes[order])
+
+        # Keep one breakpoint per distinct position, with the depth after all of its events
+        last = np.append(positions[1:] != positions[:-1], True)
+        self.breakpoints = positions[last]
+        self.depth = depth_after[last][:-1]
+        widths = np.diff(self.breakpoints)
+
+        # Prefix sums over the steps, for range queries
+        self.covered_sum = np.concatenate([[0], np.cumsum(widths * (self.depth > 0))])
+        self.depth_sum = np.concatenate([[0], np.cumsum(widths * self.depth)])
+
+    def _prefix(self, sums, rates, position):
+        # Value of a prefix sum at any position: the sum up to the start of the step the position
+        # falls in, plus rate per base for the rest of the way
+        if len(self.depth) == 0:
+            return 0
+        position = min(max(position, self.breakpoints[0]), self.breakpoints[-1])
+        i = min(np.searchsorted(self.breakpoints, position, side="right") - 1, len(self.depth) - 1)
+        return sums[i] + (position - self.breakpoints[i]) * rates[i]
+
+    def depth_at(self, position):
+        # Depth of coverage at one position (or an array of positions)
+        if len(self.depth) == 0:
+            return np.zeros_like(position)
+        i = np.searchsorted(self.breakpoints, position, side="right") - 1
+        inside = (i >= 0) & (i < len(self.depth))
+        return np.where(inside, self.depth[np.clip(i, 0, len(self.depth) - 1)], 0)
+
+    def query(self, start, end):
+        """
+        Coverage of [start, end): returns (# of bases covered at least once, mean depth).
+        """
+        covered_rate = self.depth > 0
+        covered = self._prefix(self.covered_sum, covered_rate, end) - \
+            self._prefix(self.covered_sum, covered_rate, start)
+        total_depth = self._prefix(self.depth_sum, self.depth, end) - \
+            self._prefix(self.depth_sum, self.depth, start)
+        return int(round(covered)), (total_depth / (end - start) if end > start else 0.0)
+
+    def breadth(self):
+        # Fraction of the reference covered by at least one alignment
+        return self.covered_sum[-1] / self.length if self.length else 0.0
+
+    def mean_depth(self):
+        return self.depth_sum[-1] / self.length if self.length else 0.0
+
+    def depth_histogram(self):
+        # histogram[d] is the number of reference bases covered exactly d times
+        widths = np.diff(self.breakpoints)
+        return np.bincount(self.depth, weights=widths).astype(np.int64)
+
+    def intervals(self, keep, min_length=1):
+        # Merge neighbouring steps where keep is True into (start, end) intervals
+        keep = np.concatenate([[False], keep, [False]])
+        edges = np.flatnonzero(keep[1:] != keep[:-1])
+        starts = self.breakpoints[edges[0::2]]
+        ends = self.breakpoints[edges[1::2]]
+        long_enough = (ends - starts) >= min_length
+        return starts[long_enough], ends[long_enough]
+
+    def gaps(self, min_length=1):
+        # Stretches of the reference that no alignment covers
+        return self.intervals(self.depth == 0, min_length)
+
+    def duplicated(self, min_length=1):
+        # Stretches of the reference covered by more than one alignment
+        return self.intervals(self.depth > 1, min_length)
+
+
+def build_indexes(names, starts, ends, lengths=None):
+    # One CoverageIndex per reference sequence. lengths optionally maps names to lengths
+    lengths = lengths or {}
+    indexes = {}
+    for name in np.unique(names):
+        chosen = names == name
+        indexes[name] = CoverageIndex(starts[chosen], ends[chosen], lengths.get(name))
+    return indexes
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Reading LASTZ general output and drawing contig dotplots for lastz.py.
+
+The whole LASTZ file is read in one go into NumPy arrays (reference name, zstart, zend), and the
+dotplot segments are laid out with a cumulative sum instead of a loop. Drawing is done either
+with a single LineCollection for every segment, or, for very large inputs, by rasterizing the
+segments straight into a pixel buffer and showing that as one image.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Above this many alignments, lastz.py rasterizes the dotplot instead of drawing vector lines
+RASTER_THRESHOLD = 50000
+
+
+def read_lastz(filename):
+    """
+    Read the first three fields (reference name, zstart, zend) of a LASTZ general output file.
+    The "#name1 ..." column header line is skipped. Returns (names, starts, ends) arrays.
+    """
+    df = pd.read_table(filename, header=None, comment="#", usecols=[0, 1, 2],
+                       names=["name", "zstart", "zend"],
+                       dtype={"name": str, "zstart": np.int64, "zend": np.int64})
+    return df["name"].to_numpy(), df["zstart"].to_numpy(), df["zend"].to_numpy()
+
+
+def contig_segments(starts, ends):
+    """
+    Lay every contig out next to the previous one on the x-axis. Returns (x0, x1, y0, y1) arrays;
+    contig i runs from (x0[i], y0[i]) to (x1[i], y1[i]), where y is its position in the reference.
+    """
+    lengths = ends - starts
+    x1 = np.cumsum(lengths)
+    x0 = x1 - lengths
+    return x0, x1, starts, ends
+
+
+def rasterize(x0, x1, y0, y1, extent, shape):
+    """
+    Draw every segment into a boolean pixel buffer of the given (height, width) shape covering
+    extent = (xmin, xmax, ymin, ymax). Each segment is sampled about once per pixel it crosses,
+    all segments at once.
+    """
+    height, width = shape
+    xmin, xmax, ymin, ymax = extent
+    x_scale = (width - 1) / max(xmax - xmin, 1)
+    y_scale = (height - 1) / max(ymax - ymin, 1)
+    px0 = (x0 - xmin) * x_scale
+    px1 = (x1 - xmin) * x_scale
+    py0 = (y0 - ymin) * y_scale
+    py1 = (y1 - ymin) * y_scale
+
+    # Number of samples for each segment: enough to touch every pixel it crosses
+    n_samples = np.ceil(np.maximum(np.abs(px1 - px0), np.abs(py1 - py0))).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(px0)), n_samples)
+    # Position of each sample along its segment, from 0 to 1
+    first_sample = np.cumsum(n_samples) - n_samples
+    step = np.arange(len(segment)) - np.repeat(first_sample, n_samples)
+    t = step / np.maximum(np.repeat(n_samples, n_samples) - 1, 1)
+
+    cols = np.rint(px0[segment] + t * (px1 - px0)[segment]).astype(np.int64)
+    rows = np.rint(py0[segment] + t * (py1 - py0)[segment]).astype(np.int64)
+    inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+
+    image = np.zeros(shape, dtype=bool)
+    image[rows[inside], cols[inside]] = True
+    return image
+
+
+def draw(ax, x0, x1, y0, y1, raster=False):
+    """
+    Draw the dotplot segments on ax, with the axes fit to the data. If raster is True the
+    segments are rasterized at the figure's resolution and shown with imshow.
+    """
+    import matplotlib
+    from matplotlib.collections import LineCollection
+    from matplotlib.colors import ListedColormap
+
+    # Automatic extents, with a little padding so the end points don't sit on the axes
+    xmin, xmax = 0, int(x1.max()) if len(x1) else 1
+    ymin = int(min(y0.min(), y1.min())) if len(y0) else 0
+    ymax = int(max(y0.max(), y1.max())) if len(y0) else 1
+    y_pad = max((ymax - ymin) * 0.02, 1)
+    x_pad = max((xmax - xmin) * 0.02, 1)
+    extent = (xmin - x_pad, xmax + x_pad, ymin - y_pad, ymax + y_pad)
+
+    # Cycle through the style's colors like separate ax.plot() calls would
+    palette = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+    if raster:
+        bbox = ax.get_window_extent()
+        shape = (max(int(bbox.height), 1), max(int(bbox.width), 1))
+        image = rasterize(x0, x1, y0, y1, extent, shape)
+        ax.imshow(np.ma.masked_where(~image, image), origin="lower", extent=extent,
+                  aspect="auto", interpolation="nearest", cmap=ListedColormap([palette[0]]))
+    else:
+        lines = np.stack([np.column_stack([x0, y0]), np.column_stack([x1, y1])], axis=1)
+        ax.add_collection(LineCollection(lines, colors=palette))
+
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
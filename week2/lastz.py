@@ -1,65 +1,63 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./lastz.py <LASTZ file>
+Usage: ./lastz.py [--raster | --vector] [--no-plot] <LASTZ file>
 
-<LASTZ file> A LASTZ general output file where the first three fields are the reference 
+<LASTZ file> A LASTZ general output file where the first three fields are the reference
 sequence's name, zstart, and zend.
+--raster     Rasterize the dotplot into a pixel buffer instead of drawing one line per contig.
+             This is done automatically above dotplot.RASTER_THRESHOLD alignments; --vector
+             turns that off.
 
-Produces a dotplot of each contig's alignment to the reference genome. Every contig has a 
-separate space on the x-axis (to account for duplicate coverage of one reference sequence 
+Produces a dotplot of each contig's alignment to the reference genome. Every contig has a
+separate space on the x-axis (to account for duplicate coverage of one reference sequence
 site), and the script graphs position in contig sequence vs. position in reference genome.
+The axes are fit to the data, so contigs at far positions in the reference aren't cut off.
 
-For more aesthetic results, pre-sort the LASTZ file so that the contigs are ordered by start 
+For more aesthetic results, pre-sort the LASTZ file so that the contigs are ordered by start
 position in the reference sequence:
 sort -k 2 -n <LASTZ file>
 
-The default naming of the PNG works best for files named in this format: 
+The default naming of the PNG works best for files named in this format:
 <lastz_[name]_sort.out>
+
+With --no-plot, the contig segments are written to <name>_contigs.tsv instead of the dotplot.
 """
 
+import os
 import sys
-import numpy as np
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
-
-# Open file and extract file name
-f = open(sys.argv[1])
-filename = (sys.argv[1].split("_"))[1]
-
-# Plot dotplot: contig vs. positions on reference sequence
-fig, ax = plt.subplots(figsize=(25, 10))
-
-# Set counter for current position in x-axis (i.e. current contig)
-x_pos = 0
-
-for line in f:
-    
-    # Skip first line of file with column headers
-    if line.startswith("#name1"):
-        continue
-    
-    # Extract start position, end position, and length of contig in the reference sequence
-    fields = line.rstrip("\r\n").split("\t")
-    start = int(fields[1])
-    end = int(fields[2])
-    length = end - start
-    
-    # x range is the next space on the x-axis, long enough for the whole contig
-    x = np.linspace(x_pos,x_pos+length)  
-    # y range is between this contig's start and end positions on the reference genome
-    y = np.linspace(start,end)
-    ax.plot(x, y)
-    
-    # Increment the x position counter
-    x_pos += length
-    
-# I set the y-axis to end at 100000 for aesthetic purposes
-# But this cuts out a handful of contigs at very far positions in the reference sequence
-ax.set_ylim(0,100000)    
-
-ax.set_xlabel("Contigs")
-ax.set_ylabel("Reference sequence position")
-ax.set_title("Contigs from " + filename + " aligned to reference sequence")
-fig.savefig(filename + "_contigs.png")
-plt.close(fig)
\ No newline at end of file
+import argparse
+import dotplot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("lastz")
+parser.add_argument("--raster", action="store_true")
+parser.add_argument("--vector", action="store_true")
+parser.add_argument("--no-plot", action="store_true")
+args = parser.parse_args()
+
+# Read the whole file at once and extract file name
+names, starts, ends = dotplot.read_lastz(args.lastz)
+filename = (os.path.basename(args.lastz).split("_"))[1]
+
+# Each contig takes the next space on the x-axis, long enough for the whole contig, and runs
+# between its start and end positions on the reference genome
+x0, x1, y0, y1 = dotplot.contig_segments(starts, ends)
+
+if args.no_plot:
+    startup.write_table(filename + "_contigs.tsv", ["x_start", "x_end", "zstart", "zend"],
+                        [x0, x1, y0, y1])
+else:
+    # Plot dotplot: contig vs. positions on reference sequence
+    raster = args.raster or (len(x0) > dotplot.RASTER_THRESHOLD and not args.vector)
+    plt = startup.pyplot()
+    fig, ax = plt.subplots(figsize=(25, 10))
+    dotplot.draw(ax, x0, x1, y0, y1, raster=raster)
+
+    ax.set_xlabel("Contigs")
+    ax.set_ylabel("Reference sequence position")
+    ax.set_title("Contigs from " + filename + " aligned to reference sequence")
+    fig.savefig(filename + "_contigs.png")
+    plt.close(fig)
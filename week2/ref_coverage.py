@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./ref_coverage.py [--ref-length <name>=<bp> ...] [--query <name>:<start>-<end> ...]
+                         [--min-gap <bp>] [--gaps <gaps.bed>] [--duplicated <dups.bed>]
+                         [--histogram <hist.tsv>] <LASTZ file>
+
+<LASTZ file>  A LASTZ general output file where the first three fields are the reference
+              sequence's name, zstart, and zend (the same file lastz.py plots)
+--ref-length  Length of a reference sequence. Without it, the reference is assumed to end where
+              its last alignment does. Can be given once per reference.
+--query       Report coverage of one reference window. Can be given more than once.
+--min-gap     Only report gaps and duplicated regions at least this long (default: 1)
+--gaps        Write uncovered regions of the reference to a BED file
+--duplicated  Write regions covered by more than one alignment to a BED file
+--histogram   Write the depth histogram (reference bases covered 0, 1, 2, ... times) to a table
+
+Reports, for each reference sequence, how much of it an assembly covers: breadth of coverage,
+mean depth, and the total length of gaps and duplicated regions. See coverage_index.py for how
+this is calculated.
+"""
+
+import argparse
+import dotplot
+import coverage_index
+
+parser = argparse.ArgumentParser()
+parser.add_argument("lastz")
+parser.add_argument("--ref-length", action="append", default=[])
+parser.add_argument("--query", action="append", default=[])
+parser.add_argument("--min-gap", type=int, default=1)
+parser.add_argument("--gaps")
+parser.add_argument("--duplicated")
+parser.add_argument("--histogram")
+args = parser.parse_args()
+
+# Parse name=length pairs for the reference lengths
+ref_lengths = {}
+for pair in args.ref_length:
+    name, length = pair.rsplit("=", 1)
+    ref_lengths[name] = int(length)
+
+# Build one coverage index per reference sequence
+names, starts, ends = dotplot.read_lastz(args.lastz)
+indexes = coverage_index.build_indexes(names, starts, ends, ref_lengths)
+
+# Summary for every reference sequence
+print("reference\tlength\tbreadth\tmean_depth\tgap_bp\tduplicated_bp")
+for name, index in indexes.items():
+    gap_starts, gap_ends = index.gaps(args.min_gap)
+    dup_starts, dup_ends = index.duplicated(args.min_gap)
+    print("%s\t%d\t%g\t%g\t%d\t%d" % (name, index.length, index.breadth(), index.mean_depth(),
+                                      (gap_ends - gap_starts).sum(), (dup_ends - dup_starts).sum()))
+
+# Range queries, e.g. ref:1000-2000
+for region in args.query:
+    name, span = region.rsplit(":", 1)
+    start, end = [int(x) for x in span.split("-")]
+    covered, mean_depth = indexes[name].query(start, end)
+    print("%s\tcovered=%d/%d\tmean_depth=%g" % (region, covered, end - start, mean_depth))
+
+# Gaps and duplicated regions as BED files
+for filename, method in [(args.gaps, "gaps"), (args.duplicated, "duplicated")]:
+    if not filename:
+        continue
+    out = open(filename, "w")
+    for name, index in indexes.items():
+        region_starts, region_ends = getattr(index, method)(args.min_gap)
+        for start, end in zip(region_starts, region_ends):
+            out.write("%s\t%d\t%d\n" % (name, start, end))
+    out.close()
+
+# Depth histogram, one row per reference and depth
+if args.histogram:
+    out = open(args.histogram, "w")
+    out.write("reference\tdepth\tbases\n")
+    for name, index in indexes.items():
+        for depth, bases in enumerate(index.depth_histogram()):
+            out.write("%s\t%d\t%d\n" % (name, depth, bases))
+    out.close()
@@ -2,10 +2,14 @@
 
 import sys
 
+# make_plot.py reads VCF files directly now (see lib/vcf_reader.py), so this is only needed to
+# get a header-stripped copy for other tools
+
 f = open(sys.argv[1])
 
 for line in f:
     if line.startswith("##"):
         continue
     else:
-        print(line)
\ No newline at end of file
+        # Lines already end in a newline, so don't let print add another one
+        print(line, end="")
\ No newline at end of file
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Genotype PCA, computed a chunk of variants at a time.
+
+Genotypes are read as dosages (0, 1 or 2 non-reference alleles; NaN where missing) from either
+a VCF file (the GT field) or a PLINK binary fileset (.bed/.bim/.fam). Each variant is
+standardized the way PLINK does it, (dosage - 2p) / sqrt(2p(1 - p)) with missing genotypes set
+to 0, so the principal components are the top eigenvectors of the genetic relationship matrix
+
+K = Z^T Z / (# of variants)        (Z is variants x samples)
+
+K is never built, and neither is Z. A randomized SVD only needs products of K with a thin
+samples x (k + oversample) matrix, and each of those is a sum over chunks of variants:
+
+K Q = sum over chunks of Z_c^T (Z_c Q)
+
+so every pass over the variants keeps one float32 chunk and a few samples x (k + oversample)
+matrices in memory. Dosages are stored as int8 (1 byte per genotype), either in place (.bed
+files are read straight from disk) or, for a VCF, in a temporary file written on the first pass.
+
+Example:
+    genotypes = open_genotypes("cohort.vcf.gz")
+    values, vectors = randomized_pca(genotypes, n_components=10)
+    write_eigenvec("cohort.eigenvec", genotypes.fids, genotypes.iids, vectors)
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import vcf_columns
+from vcf_reader import VCFReader
+
+# Missing genotypes in the int8 dosage matrices
+MISSING = -1
+# PLINK .bed files start with these magic bytes (the last one means variant-major)
+BED_MAGIC = b"\x6c\x1b\x01"
+# .bed genotype codes (2 bits each) as counts of the first allele: 00 -> 2, 01 -> missing,
+# 10 -> 1, 11 -> 0
+BED_CODES = np.array([2, MISSING, 1, 0], dtype=np.int8)
+# Every possible .bed byte decoded into its four genotypes
+BED_TABLE = BED_CODES[(np.arange(256)[:, None] >> (2 * np.arange(4))) & 3]
+
+
+class Genotypes(object):
+    """
+    A variants x samples int8 dosage matrix (memory-mapped) with the samples' FIDs and IIDs.
+    chunks() yields it as float32 with NaN for missing genotypes.
+    """
+
+    def __init__(self, fids, iids, n_variants, read_rows):
+        self.fids = list(fids)
+        self.iids = list(iids)
+        self.n_samples = len(self.iids)
+        self.n_variants = n_variants
+        self.read_rows = read_rows
+
+    def chunks(self, chunk_size=10000):
+        for start in range(0, self.n_variants, chunk_size):
+            dosages = self.read_rows(start, min(start + chunk_size, self.n_variants))
+            chunk = dosages.astype(np.float32)
+            chunk[dosages == MISSING] = np.nan
+            yield chunk
+
+
+def open_bed(prefix):
+    """
+    PLINK binary fileset: <prefix>.fam (samples), <prefix>.bim (variants) and <prefix>.bed.
+    Each variant is a row of ceil(samples / 4) bytes, 4 genotypes per byte.
+    """
+    fids, iids = [], []
+    for line in open(prefix + ".fam"):
+        fields = line.split()
+        fids.append(fields[0])
+        iids.append(fields[1])
+    n_variants = sum(1 for line in open(prefix + ".bim") if line.strip())
+
+    row_bytes = (len(iids) + 3) // 4
+    with open(prefix + ".bed", "rb") as f:
+        if f.read(3) != BED_MAGIC:
+            raise ValueError("%s.bed isn't a variant-major PLINK .bed file" % prefix)
+    data = np.memmap(prefix + ".bed", dtype=np.uint8, mode="r", offset=3,
+                     shape=(n_variants, row_bytes))
+
+    def read_rows(start, stop):
+        # Decode every byte into its 4 genotypes and drop the padding at the end of each row
+        return BED_TABLE[data[start:stop]].reshape(stop - start, -1)[:, :len(iids)]
+
+    return Genotypes(fids, iids, n_variants, read_rows)
+
+
+def open_vcf_genotypes(filename, chunk_size=100000, temp_dir=None):
+    """
+    Read the GT dosages of a VCF once, into an int8 matrix in a temporary file, so the passes of
+    the PCA don't have to parse the VCF again. Sample names are used as both FID and IID.
+    """
+    with VCFReader(filename) as reader:
+        samples = reader.samples
+        header_lines = reader.header_lines
+
+    temp = tempfile.TemporaryFile(dir=temp_dir)
+    n_variants = 0
+    for chunk in vcf_columns.read_chunks(filename, header_lines, chunk_size):
+        dosages = vcf_columns.genotype_dosages(chunk, len(samples)).T
+        rows = np.where(np.isnan(dosages), MISSING, dosages).astype(np.int8)
+        temp.write(rows.tobytes())
+        n_variants += len(rows)
+    temp.flush()
+
+    if n_variants and samples:
+        data = np.memmap(temp, dtype=np.int8, mode="r", shape=(n_variants, len(samples)))
+    else:
+        data = np.zeros((n_variants, len(samples)), dtype=np.int8)
+    return Genotypes(samples, samples, n_variants, lambda start, stop: data[start:stop])
+
+
+def open_genotypes(path):
+    # A VCF file, or a PLINK fileset given as its prefix or its .bed file
+    if path.endswith(".bed"):
+        path = path[:-len(".bed")]
+    if os.path.exists(path + ".bed") and os.path.exists(path + ".fam"):
+        return open_bed(path)
+    return open_vcf_genotypes(path)
+
+
+def standardize(chunk):
+    """
+    Standardize a variants x samples chunk of dosages: (dosage - 2p) / sqrt(2p(1 - p)) using
+    each variant's allele frequency p among the non-missing samples, with missing genotypes at
+    0. Monomorphic variants carry no information and are dropped.
+    """
+    called = ~np.isnan(chunk)
+    n_called = called.sum(axis=1)
+    p = np.where(called, chunk, 0).sum(axis=1) / np.maximum(2 * n_called, 1)
+    keep = (p > 0) & (p < 1)
+    chunk, called, p = chunk[keep], called[keep], p[keep, None]
+    z = (chunk - 2 * p) / np.sqrt(2 * p * (1 - p))
+    return np.where(called, z, 0).astype(np.float32)
+
+
+def relationship_product(genotypes, matrix, chunk_size):
+    # K Q (without the 1 / # of variants) as a sum over chunks, plus the number of variants used
+    product = np.zeros((genotypes.n_samples, matrix.shape[1]))
+    n_used = 0
+    for chunk in genotypes.chunks(chunk_size):
+        z = standardize(chunk)
+        product += z.T @ (z @ matrix.astype(np.float32))
+        n_used += len(z)
+    return product, n_used
+
+
+def randomized_pca(genotypes, n_components=10, oversample=10, power_iterations=2,
+                   chunk_size=10000, seed=0):
+    """
+    Top principal components of the genotypes. Returns (eigenvalues, eigenvectors): the
+    eigenvalues of K, largest first, and a samples x n_components matrix with one eigenvector per
+    column (what PLINK writes to .eigenval and .eigenvec). Makes power_iterations + 2 passes over
+    the variants.
+    """
+    width = min(n_components + oversample, genotypes.n_samples)
+    rng = np.random.default_rng(seed)
+
+    # Find a basis Q for the range of K: K times a random matrix, sharpened by power iterations
+    basis = rng.standard_normal((genotypes.n_samples, width))
+    for i in range(power_iterations + 1):
+        basis, n_used = relationship_product(genotypes, basis, chunk_size)
+        basis = np.linalg.qr(basis)[0]
+
+    # Project K onto the basis (Q^T K Q is only width x width) and take its eigenvectors
+    product, n_used = relationship_product(genotypes, basis, chunk_size)
+    values, small_vectors = np.linalg.eigh(basis.T @ product)
+    order = np.argsort(values)[::-1][:n_components]
+    values = values[order] / max(n_used, 1)
+    vectors = basis @ small_vectors[:, order]
+    # Eigenvectors only have a direction up to sign; make the biggest entry of each positive so
+    # reruns give the same output
+    signs = np.sign(vectors[np.abs(vectors).argmax(axis=0), np.arange(vectors.shape[1])])
+    return values, vectors * np.where(signs == 0, 1, signs)
+
+
+def write_eigenvec(filename, fids, iids, vectors):
+    # PLINK's .eigenvec layout: FID, IID, then one column per PC, space-separated, no header
+    out = open(filename, "w")
+    for fid, iid, row in zip(fids, iids, vectors):
+        out.write(" ".join([fid, iid] + ["%g" % x for x in row]) + "\n")
+    out.close()
+
+
+def write_eigenval(filename, values):
+    out = open(filename, "w")
+    for value in values:
+        out.write("%g\n" % value)
+    out.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Index of significant GWAS hits across every phenotype in a qassoc store (see qassoc_store.py).
+
+A hit is one (SNP, phenotype) pair with -log10(p) above the threshold (5, like the highlighted
+points in make_manplot.py). The hits are kept as parallel arrays sorted by chromosome and then
+position:
+
+chrom      - Chromosome of each hit, as an index into chromosomes
+bp         - Position of each hit
+snp        - Row of the SNP in the store
+phenotype  - Phenotype of each hit, as an index into phenotypes
+pvalue     - -log10(p) of each hit
+
+so a window query is a binary search (np.searchsorted), and counts per SNP or per phenotype are
+np.bincount calls. The index is saved as one .npz file next to the store and rebuilt only when
+it's missing or the threshold changes.
+
+Example:
+    index = HitIndex.build(QassocStore("gwas_store"))
+    index.shared(3)                         # SNPs significant in at least 3 phenotypes
+    index.window("chrI", 0, 100000, top=10) # strongest hits in a window
+    index.counts()                          # number of hits for each phenotype
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import manhattan
+import qassoc_store
+
+INDEX_FILE = "hits.npz"
+
+
+class HitIndex(object):
+
+    def __init__(self, chromosomes, phenotypes, snp_names, threshold,
+                 chrom, bp, snp, phenotype, pvalue):
+        self.chromosomes = np.asarray(chromosomes, dtype=str)
+        self.phenotypes = np.asarray(phenotypes, dtype=str)
+        self.snp_names = np.asarray(snp_names, dtype=str)
+        self.threshold = float(threshold)
+        self.chrom = chrom
+        self.bp = bp
+        self.snp = snp
+        self.phenotype = phenotype
+        self.pvalue = pvalue
+        # Where each chromosome's hits start and end in the sorted arrays
+        self.chrom_starts = np.searchsorted(self.chrom, np.arange(len(self.chromosomes)), side="left")
+        self.chrom_ends = np.searchsorted(self.chrom, np.arange(len(self.chromosomes)), side="right")
+
+    @classmethod
+    def build(cls, store, threshold=manhattan.SIGNIFICANT):
+        snps = store.snps()
+        chromosomes, chrom_codes = np.unique(snps["CHR"], return_inverse=True)
+        phenotypes = store.phenotypes()
+
+        # Collect the significant rows of every phenotype's p-values
+        snp_rows = []
+        phenotype_codes = []
+        pvalues = []
+        for i, name in enumerate(phenotypes):
+            pvalue = -np.log10(np.asarray(store.p(name), dtype=float))
+            rows = np.flatnonzero(pvalue > threshold)
+            snp_rows.append(rows)
+            phenotype_codes.append(np.full(len(rows), i, dtype=np.int32))
+            pvalues.append(pvalue[rows])
+        snp = np.concatenate(snp_rows or [np.zeros(0, dtype=np.int64)])
+        phenotype = np.concatenate(phenotype_codes or [np.zeros(0, dtype=np.int32)])
+        pvalue = np.concatenate(pvalues or [np.zeros(0)])
+
+        # Sort by chromosome, then position (then SNP and phenotype, so each SNP's hits are
+        # next to each other)
+        chrom = chrom_codes[snp]
+        bp = snps["BP"][snp]
+        order = np.lexsort((phenotype, snp, bp, chrom))
+        return cls(chromosomes, phenotypes, snps["SNP"], threshold,
+                   chrom[order], bp[order], snp[order], phenotype[order], pvalue[order])
+
+    def save(self, filename):
+        np.savez(filename, chromosomes=self.chromosomes, phenotypes=self.phenotypes,
+                 snp_names=self.snp_names, threshold=self.threshold, chrom=self.chrom,
+                 bp=self.bp, snp=self.snp, phenotype=self.phenotype, pvalue=self.pvalue)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            return cls(data["chromosomes"], data["phenotypes"], data["snp_names"],
+                       data["threshold"], data["chrom"], data["bp"], data["snp"],
+                       data["phenotype"], data["pvalue"])
+
+    def hits(self, chosen=slice(None)):
+        # Hits (all of them, or some rows of the sorted arrays) as a DataFrame
+        return pd.DataFrame({"CHR": self.chromosomes[self.chrom[chosen]],
+                             "BP": self.bp[chosen],
+                             "SNP": self.snp_names[self.snp[chosen]],
+                             "phenotype": self.phenotypes[self.phenotype[chosen]],
+                             "pvalue": self.pvalue[chosen]})
+
+    def shared(self, min_phenotypes=2):
+        """
+        SNPs significant in at least min_phenotypes phenotypes: CHR, BP, SNP, the number of
+        phenotypes, and their names (comma-separated), in genome order.
+        """
+        counts = np.bincount(self.snp, minlength=len(self.snp_names))
+        # Each SNP's hits are next to each other, so take the first hit of each
+        first = np.flatnonzero(np.concatenate([[True], self.snp[1:] != self.snp[:-1]]))
+        first = first[:len(self.snp)]
+        keep = first[counts[self.snp[first]] >= min_phenotypes]
+        names = [",".join(self.phenotypes[self.phenotype[start:start + counts[self.snp[start]]]])
+                 for start in keep]
+        return pd.DataFrame({"CHR": self.chromosomes[self.chrom[keep]],
+                             "BP": self.bp[keep],
+                             "SNP": self.snp_names[self.snp[keep]],
+                             "n_phenotypes": counts[self.snp[keep]],
+                             "phenotypes": names})
+
+    def window(self, chromosome, start, end, top=None):
+        # Hits with start <= BP < end on one chromosome, strongest first
+        matches = np.flatnonzero(self.chromosomes == chromosome)
+        if len(matches) == 0:
+            return self.hits(slice(0, 0))
+        code = matches[0]
+        bp = self.bp[self.chrom_starts[code]:self.chrom_ends[code]]
+        first = self.chrom_starts[code] + np.searchsorted(bp, start, side="left")
+        last = self.chrom_starts[code] + np.searchsorted(bp, end, side="left")
+        rows = first + np.argsort(-self.pvalue[first:last], kind="stable")
+        return self.hits(rows[:top])
+
+    def counts(self):
+        # Number of hits for each phenotype, including the ones with none
+        return pd.Series(np.bincount(self.phenotype, minlength=len(self.phenotypes)),
+                         index=self.phenotypes, name="hits")
+
+
+def open_index(store, threshold=manhattan.SIGNIFICANT, rebuild=False):
+    """
+    Load the store's hit index, or build (and save) it if it's missing, older than the store's
+    p-values, or was made with a different threshold.
+    """
+    filename = os.path.join(store.store_dir, INDEX_FILE)
+    if not rebuild and os.path.exists(filename):
+        index_time = os.path.getmtime(filename)
+        p_dir = os.path.join(store.store_dir, qassoc_store.P_DIR)
+        newest = max([os.path.getmtime(p_dir)] + [os.path.getmtime(os.path.join(p_dir, name))
+                                                   for name in os.listdir(p_dir)])
+        if index_time >= newest:
+            index = HitIndex.load(filename)
+            if index.threshold == threshold:
+                return index
+    index = HitIndex.build(store, threshold)
+    index.save(filename)
+    return index
@@ -1,44 +1,60 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./make_af.py <VCF file>
+Usage: ./make_af.py [--no-plot] [--bins <n>] <VCF or af.tsv file 1> ... <VCF or af.tsv file n>
 
-<VCF file> Output of freebayes with extensive filtering. The only information in the INFO 
-column should be the AF value(s).
+<VCF file> Output of freebayes with extensive filtering (plain or bgzipped). AF is looked up
+           by key, so the INFO column can have other keys too.
+<af.tsv>   A histogram table written by make_af.py --no-plot, with the same number of bins.
+           Its counts are added to the others, so e.g. per-chromosome runs can be combined.
+--bins     Number of histogram bins between 0 and 1 (default: 100)
 
-Makes a histogram of allele frequency values from a freebayes VCF output file.
+Makes a histogram of allele frequency values from freebayes VCF output files. The AF values are
+binned while the file is read (see info_histogram in lib/vcf_columns.py), so only the bin counts
+are kept in memory, however big the files are. Multi-allelic sites add one value per allele.
+With --no-plot, the bin counts are written to af.tsv instead.
 """
 
+import os
 import sys
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
-
-# Open file
-f = open(sys.argv[1])
-
-# Parse file to extract AF values
-af_list = []
-for line in f:
-    # Skip header lines
-    if line.startswith("#"):
-        continue
-    fields = line.rstrip("\r\n").split("\t")
-    # the 8th field is INFO. Split it by the = and take out the values, which are on the right side of the = sign
-    af = (fields[7].split("="))[1]
-    if "," in af:
-        afs = af.split(",")
-        # Account for multiple AF values in one line by appending all of them to the list
-        for i in range(len(afs)):
-            af_list.append(float(afs[i]))
+import argparse
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+import vcf_columns
+
+parser = argparse.ArgumentParser()
+parser.add_argument("inputs", nargs="+")
+parser.add_argument("--no-plot", action="store_true")
+parser.add_argument("--bins", type=int, default=100)
+args = parser.parse_args()
+
+# Fixed bins between 0 and 1, so histograms from different files line up and can be added
+edges = np.linspace(0, 1, args.bins + 1)
+counts = np.zeros(args.bins, dtype=np.int64)
+
+for filename in args.inputs:
+    if filename.endswith(".tsv"):
+        # A histogram from an earlier run
+        table = pd.read_table(filename)
+        if len(table) != args.bins or not np.allclose(table["bin_start"], edges[:-1]):
+            sys.exit("%s doesn't have %d bins between 0 and 1" % (filename, args.bins))
+        counts += table["count"].to_numpy(dtype=np.int64)
     else:
-        af_list.append(float(af))
+        counts += vcf_columns.info_histogram(filename, "AF", edges)
 
 # Make histogram
-fig, ax = plt.subplots()
-ax.hist(af_list, color="royalblue", bins=100)
-ax.set_xlabel("Allele frequency")
-ax.set_ylabel("Number of variants")
-ax.set_title("Distribution of allele frequencies among individual variants")
-plt.tight_layout()
-fig.savefig("af.png")
-plt.close(fig)
\ No newline at end of file
+if args.no_plot:
+    startup.write_table("af.tsv", ["bin_start", "bin_end", "count"],
+                        [edges[:-1].tolist(), edges[1:].tolist(), counts.tolist()])
+else:
+    plt = startup.pyplot()
+    fig, ax = plt.subplots()
+    ax.hist(edges[:-1], bins=edges, weights=counts, color="royalblue")
+    ax.set_xlabel("Allele frequency")
+    ax.set_ylabel("Number of variants")
+    ax.set_title("Distribution of allele frequencies among individual variants")
+    plt.tight_layout()
+    fig.savefig("af.png")
+    plt.close(fig)
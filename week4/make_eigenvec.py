@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./make_eigenvec.py [--pcs <n>] [--power-iterations <n>] [--chunk-size <variants>]
+                          [--seed <n>] <genotypes> <output prefix>
+
+<genotypes>         A VCF file with GT calls (plain or bgzipped), or a PLINK binary fileset
+                    (<prefix>.bed/.bim/.fam, given as the prefix or the .bed file)
+<output prefix>     Writes <output prefix>.eigenvec and <output prefix>.eigenval
+--pcs               Number of principal components (default: 10)
+--power-iterations  Extra passes over the variants that make the PCs more accurate (default: 2)
+--chunk-size        Variants per chunk (default: 10000)
+--seed              Seed for the random starting matrix (default: 0)
+
+Computes a genotype PCA the way PLINK's --pca does (see genotype_pca.py), reading the variants
+a chunk at a time. The .eigenvec file has the same layout as PLINK's, so make_pca.py can plot it
+directly.
+"""
+
+import argparse
+import genotype_pca
+
+parser = argparse.ArgumentParser()
+parser.add_argument("genotypes")
+parser.add_argument("output")
+parser.add_argument("--pcs", type=int, default=10)
+parser.add_argument("--power-iterations", type=int, default=2)
+parser.add_argument("--chunk-size", type=int, default=10000)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+genotypes = genotype_pca.open_genotypes(args.genotypes)
+values, vectors = genotype_pca.randomized_pca(genotypes, args.pcs,
+                                              power_iterations=args.power_iterations,
+                                              chunk_size=args.chunk_size, seed=args.seed)
+genotype_pca.write_eigenvec(args.output + ".eigenvec", genotypes.fids, genotypes.iids, vectors)
+genotype_pca.write_eigenval(args.output + ".eigenval", values)
@@ -1,129 +1,91 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./make_manplot.py <.qassoc file 1> ... <.qassoc file n>
+Usage: ./make_manplot.py [--no-plot] [--workers <n>] [--downsample | --exact]
+                         <.qassoc file 1> ... <.qassoc file n>
+       ./make_manplot.py [--no-plot] [--workers <n>] [--downsample | --exact]
+                         --store <store> [<phenotype> ...]
 
 <.qassoc file> Any number of .qassoc files output from plink.
+--workers      Make this many plots at once, in a process pool (default: 1)
+--store        Read the p-values from a store made by qassoc_to_store.py instead. The arguments
+               are then phenotype names (default: every phenotype in the store).
+--downsample   Only draw one non-significant SNP per half-pixel of the plot (significant SNPs are
+               all drawn). This is done automatically above manhattan.DOWNSAMPLE_THRESHOLD SNPs;
+               --exact turns that off.
 
 Produce a Manhattan plot, showing association of SNPs with a specific phenotype, from a plink 
 .qassoc file. Highlight SNPs with p-values less than 10^-5. The chromosomes will be plotted 
 out of order because their names are Roman numerals and pandas sorts them alphabetically.
+With --no-plot, each treatment's plotted values are written to <treatment>_manplot.tsv instead.
+
+The positions and the plot are made in manhattan.py. SNPs are spaced relative to each other on
+the chromosome, and consecutive chromosomes are indexed right after each other - if chrI is
+100bp long and chrII is 200bp long, the indexing for chrII will start at 100 and count up from
+there.
 
 I'd like to thank Elad Joseph on StackOverflow for the dataframe idea, and Rebekka for working
 with me. I'd also like to thank Peter because I used a bunch of his dataframe plotting code 
 from the week 5 review.
 """
 
+import os
 import sys
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import manhattan
+import qassoc_store
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("qassoc", nargs="*")
+parser.add_argument("--no-plot", action="store_true")
+parser.add_argument("--workers", type=int, default=1)
+parser.add_argument("--store")
+parser.add_argument("--downsample", action="store_true")
+parser.add_argument("--exact", action="store_true")
+args = parser.parse_args()
 
+if args.store:
+    store = qassoc_store.QassocStore(args.store)
+    inputs = args.qassoc or store.phenotypes()
+elif args.qassoc:
+    inputs = args.qassoc
+else:
+    parser.error("give some .qassoc files, or --store")
 
 
-for f in sys.argv[1:]:
-    
-    
-    # Extract name of the experimental treatment from the file name
-    treatment = f.split(".")[1]
-    # Read the file as a dataframe
-    df = pd.read_table(f, delim_whitespace=True)
-    
-    
-    """
-    PART 1
-    
-    Create a column of index values that lets you plot each chromosome consecutively on the
-    same plot.
-    
-    Peter's pandas method indexes each SNP one after the other, without accounting for the 
-    distance between SNPs. That's a lot easier, and it looks pretty much the same as this
-    method, but oh well, we coded this already...
-    
-    Witn this indexing, we space SNPs relative to each other on the chromosome. Also, it 
-    indexes consecutive chromosomes right after each other - if chrI is 100bp long and chrII 
-    is 200bp long, the indexing for chrII will start at 100 and count up from there. This 
-    doesn't account for chromosomes where the SNPs in the VCF file don't cover the entire 
-    length of the chromosome, but that's probably not super important.
-    """
-  
-    # Pull out the column that shows each SNP's location on the chromosome
-    bp = df.loc[:,"BP"].tolist()
+def make_manplot(f):
+    # Read the file (or the store) and add the -log(p-values), positions, and significant
+    # p-values (p < 10^-5). With a store, f is already the treatment name; otherwise extract it
+    # from the file name
+    if args.store:
+        treatment = f
+        df = manhattan.manhattan_table(store.table(f))
+    else:
+        treatment = qassoc_store.phenotype_name(f)
+        df = manhattan.manhattan_table(manhattan.read_qassoc(f))
 
-    # positions is a list of each SNP's new index position
-    positions = []
-    # Count keeps track of which position you're currently at
-    count = 0
+    # Data-only mode: write out the columns that would be plotted
+    if args.no_plot:
+        filename = treatment + "_manplot.tsv"
+        df.loc[:, ["CHR", "SNP", "BP", "position", "pvalue", "sigs"]].to_csv(
+            filename, sep="\t", index=False, na_rep="NA")
+        return filename
 
-    # Loop through the list of BP positions
-    for i, pos in enumerate(bp):
-        # At the very first BP position, create a 0 index value in the positions list
-        if i == 0:
-            positions.append(0)
-        # If your current BP value is less than the previous one, this indicates that a new chromosome has started
-        # So you want this chr's indexing to start right after the previous one ended
-        # Which means your next index position is just 1 more than the previous one
-        elif bp[i] < bp[i-1]:
-            positions.append(count + 1)
-            count += 1
-        # Otherwise add the location for your new SNP
-        # The difference in position between the previous SNP and this one should = how far your new SNP is from the previous position
-        else:
-            difference = bp[i] - bp[i-1]
-            positions.append(count + difference)
-            count += difference
-    
-    
-    """
-    PART 2
-    
-    Reorganize the dataframe so it has the information you need:
-    - -log(p-values)
-    - significant p-values (p < 10^-5)
-    - grouping by chromosome (for plotting purposes)
-    """
-        
-    # Add a column with -log10 of the p-values
-    pvalue = -np.log10(df.loc[:,"P"])
-    df = df.assign(pvalue=pvalue, position=positions)
-    
-    # Add a column with all the significant p-values (p < 10^-5)
-    # I'm still not entirely sure how this syntax works, but it works. Thanks Rebekka
-    df.loc[df['pvalue'] > 5, 'sigs'] = df['pvalue']
-    
-    # Group by chromosome name. I don't know why we need to say sort=False, but things are out of order otherwise
-    groups = df.groupby('CHR', sort=False)
+    plt = startup.pyplot(style=None)
+    downsample = args.downsample or (len(df) > manhattan.DOWNSAMPLE_THRESHOLD and not args.exact)
+    fig = manhattan.plot(df, treatment, plt, downsample=downsample)
+    filename = treatment + "_manplot.png"
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
 
 
-    """
-    PART 3
-    
-    Make a Manhattan plot from the dataframe by iterating through the groups (i.e. through 
-    each individual chromosome), plotting the SNPs and significant SNPs.
-    """
-    
-    fig, ax = plt.subplots(figsize=(20,10))
-    
-    # Pick two colors to label alternate chromosomes and their significant p-values. Thanks Peter
-    colors = ['lightblue', 'thistle']
-    highlights = ['dodgerblue', 'purple']
-    
-    # Iterate through all the chromosomes and plot each one separately
-    # While iterating, keep running lists of chromosome names and x-label positions as you encounter them
-    x_labels = []
-    x_labels_pos = []
-    
-    for i, (name, group) in enumerate(groups):
-        ax.scatter(group.position, group.pvalue, s=1, color=colors[i%2])
-        ax.scatter(group.position, group.sigs, s=1, color=highlights[i%2])
-        x_labels.append(name)
-        # Set the position of the x label to be the center of this chromosome's x-range
-        x_labels_pos.append(np.median(group.position))
-    
-    ax.set_xticklabels(x_labels, rotation=50, fontsize=8)
-    ax.set_xticks(x_labels_pos)
-    ax.set_xlabel("Chromosome")
-    ax.set_ylabel("-log(p-value)")
-    ax.set_title(treatment)
-    fig.savefig(treatment + "_manplot.png")
-    plt.close()
\ No newline at end of file
+# One file at a time, or every phenotype file spread over a process pool
+if args.workers > 1 and len(inputs) > 1:
+    with startup.process_pool(args.workers) as pool:
+        pool.map(make_manplot, inputs)
+else:
+    for f in inputs:
+        make_manplot(f)
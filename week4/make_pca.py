@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./make_pca.py <eigenvec file>
+Usage: ./make_pca.py [--no-plot] <eigenvec file>
 
 <eigenvec file> Eigenvector output file from PLINK
 
-Makes a PCA plot from the PLINK analysis output.
+Makes a PCA plot from the PLINK analysis output. With --no-plot, the PC1 and PC2 values are
+written to pca.tsv instead.
 """
 
+import os
 import sys
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+no_plot = startup.pop_flag("--no-plot")
 
 # Open eigenvector file
 f = open(sys.argv[1])
@@ -26,11 +30,15 @@ for line in f:
     pca2_list.append(pca2)
     
 # Plot in a scatterplot
-fig, ax = plt.subplots()
-ax.scatter(pca1_list, pca2_list, alpha=0.3, s=10, color="mediumvioletred")
-ax.set_xlabel("PC1")
-ax.set_ylabel("PC2")
-ax.set_title("PCA")
-plt.tight_layout()
-fig.savefig("pca.png")
-plt.close(fig)
\ No newline at end of file
+if no_plot:
+    startup.write_table("pca.tsv", ["PC1", "PC2"], [pca1_list, pca2_list])
+else:
+    plt = startup.pyplot()
+    fig, ax = plt.subplots()
+    ax.scatter(pca1_list, pca2_list, alpha=0.3, s=10, color="mediumvioletred")
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_title("PCA")
+    plt.tight_layout()
+    fig.savefig("pca.png")
+    plt.close(fig)
\ No newline at end of file
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Manhattan plots from plink .qassoc files.
+
+Every SNP gets a position on one shared x-axis: SNPs are spaced by their distance in base pairs,
+and each chromosome starts one position after the previous one ends (a new chromosome is
+spotted where BP drops). That is a cumulative sum over the step from each SNP to the next, so
+it's computed for the whole file at once with np.diff/np.cumsum.
+
+The plot itself is one scatter call per color (two for the alternating chromosome colors, two
+for their significant SNPs) instead of two per chromosome, and the x labels come from a groupby
+median of the positions. For dense files, plot(downsample=True) only draws one non-significant
+point per half-pixel; this is done automatically above DOWNSAMPLE_THRESHOLD SNPs.
+
+Example:
+    df = manhattan_table(read_qassoc("plink.Caffeine.qassoc"))
+    fig = plot(df, "Caffeine", startup.pyplot(style=None))
+"""
+
+import numpy as np
+import pandas as pd
+
+# -log10(p) above which a SNP is highlighted (p < 10^-5)
+SIGNIFICANT = 5
+COLORS = ["lightblue", "thistle"]
+HIGHLIGHTS = ["dodgerblue", "purple"]
+# Number of SNPs above which make_manplot.py thins out the non-significant points
+DOWNSAMPLE_THRESHOLD = 200000
+# Bins per pixel (in each direction) when thinning. Markers are antialiased, so where a point
+# falls inside its pixel still shows; half-pixel bins keep the PNG looking the same
+SUBPIXELS = 2
+
+
+def read_qassoc(filename):
+    return pd.read_table(filename, sep=r"\s+")
+
+
+def genomic_positions(bp):
+    """
+    Position of every SNP on the shared x-axis. The first SNP is at 0; after that each SNP is
+    the distance from the previous SNP further along, or 1 further along at the start of a new
+    chromosome (where BP drops).
+    """
+    bp = np.asarray(bp, dtype=np.int64)
+    if len(bp) == 0:
+        return bp
+    steps = np.diff(bp)
+    steps[steps < 0] = 1
+    return np.concatenate([[0], np.cumsum(steps)])
+
+
+def manhattan_table(df):
+    # Add the -log10(p-values), x positions, and the significant -log10(p-values) (NaN elsewhere)
+    pvalue = -np.log10(df.loc[:, "P"])
+    df = df.assign(pvalue=pvalue, position=genomic_positions(df.loc[:, "BP"]))
+    df.loc[df["pvalue"] > SIGNIFICANT, "sigs"] = df["pvalue"]
+    if "sigs" not in df:
+        df = df.assign(sigs=np.nan)
+    return df
+
+
+def chromosome_parity(df):
+    # 0 for the 1st, 3rd, 5th, ... chromosome in file order and 1 for the others, for colors
+    new_chromosome = (df["CHR"] != df["CHR"].shift()).to_numpy()
+    return (np.cumsum(new_chromosome) - 1) % 2
+
+
+def data_limits(values, margin):
+    # The axis limits matplotlib would pick for these values (its default 5% margins)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0.0, 1.0
+    low, high = values.min(), values.max()
+    pad = (high - low) * margin if high > low else 0.5
+    return low - pad, high + pad
+
+
+def pixel_thin(x, y, xlim, ylim, width, height):
+    """
+    Rows of (x, y) to draw so that every bin of a width x height grid over the plot area that
+    would get a point still gets one: the points are binned by column and row, and the first
+    point in each occupied bin is kept (so the top and bottom of every column are still drawn).
+    Returns indices into x and y.
+    """
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    column = ((x[finite] - xlim[0]) / (xlim[1] - xlim[0]) * width).astype(np.int64)
+    row = ((y[finite] - ylim[0]) / (ylim[1] - ylim[0]) * height).astype(np.int64)
+    column = np.clip(column, 0, width - 1)
+    row = np.clip(row, 0, height - 1)
+    cells, first = np.unique(column * height + row, return_index=True)
+    return finite[np.sort(first)]
+
+
+def plot(df, title, plt, downsample=False):
+    """
+    Draw the Manhattan plot. With downsample, the points below the threshold are thinned to at
+    most one per half-pixel (see pixel_thin), so the number of points drawn is bounded by the
+    figure's resolution instead of the number of SNPs. Significant SNPs are always all drawn.
+    """
+    fig, ax = plt.subplots(figsize=(20, 10))
+    position = df["position"].to_numpy(dtype=float)
+    pvalue = df["pvalue"].to_numpy(dtype=float)
+    sigs = df["sigs"].to_numpy(dtype=float)
+
+    if downsample:
+        # Fix the axis limits first, so data coordinates can be mapped to pixels
+        xlim = data_limits(position, plt.rcParams["axes.xmargin"])
+        ylim = data_limits(pvalue, plt.rcParams["axes.ymargin"])
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        extent = ax.get_window_extent()
+        width = max(int(extent.width), 1) * SUBPIXELS
+        height = max(int(extent.height), 1) * SUBPIXELS
+
+    # One scatter per color: alternate chromosomes, then their significant SNPs on top
+    parity = chromosome_parity(df)
+    for values, colors in [(pvalue, COLORS), (sigs, HIGHLIGHTS)]:
+        for i, color in enumerate(colors):
+            chosen = np.flatnonzero(parity == i)
+            if downsample and values is pvalue:
+                # Significant SNPs are drawn exactly on top, so only thin out the others
+                chosen = chosen[~(sigs[chosen] > 0)]
+                chosen = chosen[pixel_thin(position[chosen], values[chosen], xlim, ylim,
+                                           width, height)]
+            elif downsample:
+                chosen = chosen[~np.isnan(values[chosen])]
+            ax.scatter(position[chosen], values[chosen], s=1, color=color)
+
+    # Label each chromosome at the middle of its x-range
+    # sort=False keeps the chromosomes in file order
+    middles = df.groupby("CHR", sort=False)["position"].median()
+    ax.set_xticks(middles.to_numpy())
+    ax.set_xticklabels(middles.index, rotation=50, fontsize=8)
+    ax.set_xlabel("Chromosome")
+    ax.set_ylabel("-log(p-value)")
+    ax.set_title(title)
+    return fig
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Columnar store for plink .qassoc files that share one SNP set.
+
+Every phenotype's .qassoc file repeats the same CHR/SNP/BP columns; only P changes. The store
+keeps those shared columns once and each phenotype's P column as its own float64 .npy file:
+
+<store>/snps.npz        CHR, SNP and BP, in file order
+<store>/P/<name>.npy    P for one phenotype (named like make_manplot.py names its plots)
+
+The .npy files are opened with np.load(mmap_mode="r"), so reading a phenotype only touches its
+own P vector (8 bytes per SNP) and nothing is parsed. P stays float64 because the strongest hits
+have p-values far below float32's smallest value (about 1e-45), which would round them to 0.
+
+Example:
+    build_store("gwas_store", glob.glob("plink.*.qassoc"))
+    store = QassocStore("gwas_store")
+    store.phenotypes()          # ["Caffeine", ...]
+    store.p("Caffeine")         # memory-mapped float64 array, one value per SNP
+    store.table("Caffeine")     # CHR/SNP/BP/P DataFrame, like read_qassoc()
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import manhattan
+
+SNP_FILE = "snps.npz"
+P_DIR = "P"
+
+
+def phenotype_name(filename):
+    # ../gwas/plink.Caffeine.qassoc -> Caffeine, the same name make_manplot.py uses
+    return os.path.basename(filename).split(".")[1]
+
+
+def build_store(store_dir, filenames):
+    """
+    Write the shared SNP columns from the first file, then each file's P column. Every file has
+    to list the same SNPs in the same order, or a ValueError is raised.
+    """
+    os.makedirs(os.path.join(store_dir, P_DIR), exist_ok=True)
+    snps = None
+    names = []
+    for filename in filenames:
+        if snps is None:
+            df = manhattan.read_qassoc(filename)
+            snps = df.loc[:, "SNP"].to_numpy(dtype=str)
+            np.savez(os.path.join(store_dir, SNP_FILE), CHR=df.loc[:, "CHR"].to_numpy(dtype=str),
+                     SNP=snps, BP=df.loc[:, "BP"].to_numpy(dtype=np.int64))
+        else:
+            # The other files only need their SNP names (to check them) and P
+            df = pd.read_table(filename, sep=r"\s+", usecols=["SNP", "P"])
+            if len(df) != len(snps) or not np.array_equal(df.loc[:, "SNP"].to_numpy(dtype=str), snps):
+                raise ValueError("%s doesn't have the same SNPs as %s" % (filename, filenames[0]))
+        name = phenotype_name(filename)
+        np.save(os.path.join(store_dir, P_DIR, name + ".npy"),
+                df.loc[:, "P"].to_numpy(dtype=np.float64))
+        names.append(name)
+    return names
+
+
+class QassocStore(object):
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        # The SNP columns are only read when something asks for them
+        self._snps = None
+
+    def snps(self):
+        if self._snps is None:
+            with np.load(os.path.join(self.store_dir, SNP_FILE)) as data:
+                self._snps = dict((key, data[key]) for key in ("CHR", "SNP", "BP"))
+        return self._snps
+
+    def phenotypes(self):
+        return sorted(name[:-len(".npy")] for name in os.listdir(os.path.join(self.store_dir, P_DIR))
+                      if name.endswith(".npy"))
+
+    def p(self, name):
+        return np.load(os.path.join(self.store_dir, P_DIR, name + ".npy"), mmap_mode="r")
+
+    def table(self, name):
+        # The same columns make_manplot.py reads from a .qassoc file
+        snps = self.snps()
+        return pd.DataFrame({"CHR": snps["CHR"], "SNP": snps["SNP"], "BP": snps["BP"],
+                             "P": np.asarray(self.p(name), dtype=float)})
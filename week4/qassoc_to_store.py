@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./qassoc_to_store.py <store directory> <.qassoc file 1> ... <.qassoc file n>
+
+<store directory> Where to write the store (it's created if it doesn't exist)
+<.qassoc file>    Any number of .qassoc files output from plink, all for the same SNPs
+
+Converts plink .qassoc files into a columnar store (see qassoc_store.py): the CHR/SNP/BP
+columns are written once, and each phenotype's p-values are written as a float64 array that
+make_manplot.py --store can read without parsing any text.
+"""
+
+import sys
+import qassoc_store
+
+names = qassoc_store.build_store(sys.argv[1], sys.argv[2:])
+print("Wrote %d phenotypes to %s" % (len(names), sys.argv[1]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./query_hits.py [--threshold <-log10 p>] [--rebuild] [--shared <n>]
+                       [--window <chrom>:<start>-<end>] [--top <n>] [--counts] <store>
+
+<store>      A store made by qassoc_to_store.py
+--threshold  -log10(p) a SNP has to be above to count as a hit (default: 5, i.e. p < 10^-5)
+--rebuild    Rebuild the hit index even if an up-to-date one is saved in the store
+--shared     List SNPs that are hits in at least this many phenotypes
+--window     List the hits in one window of a chromosome, strongest first
+--top        Only list this many hits from --window
+--counts     Number of hits for each phenotype
+
+Answers questions about significant hits across every phenotype at once, from the hit index in
+hit_index.py. The index is built from the store's p-values the first time and saved in the store,
+so later queries don't read any association files. Results are printed as tab-separated tables.
+"""
+
+import sys
+import argparse
+import manhattan
+import hit_index
+import qassoc_store
+
+parser = argparse.ArgumentParser()
+parser.add_argument("store")
+parser.add_argument("--threshold", type=float, default=manhattan.SIGNIFICANT)
+parser.add_argument("--rebuild", action="store_true")
+parser.add_argument("--shared", type=int)
+parser.add_argument("--window")
+parser.add_argument("--top", type=int)
+parser.add_argument("--counts", action="store_true")
+args = parser.parse_args()
+
+index = hit_index.open_index(qassoc_store.QassocStore(args.store), args.threshold, args.rebuild)
+
+if args.shared is not None:
+    index.shared(args.shared).to_csv(sys.stdout, sep="\t", index=False)
+
+# Windows look like chrI:1000-2000
+if args.window:
+    chromosome, span = args.window.rsplit(":", 1)
+    start, end = [int(x) for x in span.split("-")]
+    index.window(chromosome, start, end, args.top).to_csv(sys.stdout, sep="\t", index=False)
+
+if args.counts:
+    index.counts().to_csv(sys.stdout, sep="\t", index_label="phenotype")
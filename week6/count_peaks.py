@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./count_peaks.py [--overlap start|partial|full] [--workers <n>] [--assignments <file>]
+                        <features> <counts> <peak file 1> ... <peak file n>
+
+<features>     Table of genome features (chromosome, start, end, type)
+<counts>       Where to write the count matrix: one row per peak file, one column per feature
+               type (plus "other" for peaks that overlap no feature)
+<peak file>    Any number of MACS peak files (BED or narrowPeak). Samples are named after the
+               file name, up to the first "."
+--overlap      How a peak has to overlap a feature to count (default: partial; see plots.py)
+--workers      Look up this many chromosomes at once, in a process pool (default: 1)
+--assignments  Also write every peak with the feature types it overlaps
+
+Counts how many peaks of each sample overlap each type of genome feature, for all the samples
+in one run (see peak_overlaps.py).
+"""
+
+import argparse
+import feature_index
+import peak_overlaps
+
+parser = argparse.ArgumentParser()
+parser.add_argument("features")
+parser.add_argument("counts")
+parser.add_argument("peaks", nargs="+")
+parser.add_argument("--overlap", choices=feature_index.MODES, default="partial")
+parser.add_argument("--workers", type=int, default=1)
+parser.add_argument("--assignments")
+args = parser.parse_args()
+
+index = feature_index.FeatureIndex(*feature_index.read_bed(args.features, 4))
+peaks = peak_overlaps.Peaks.read(args.peaks)
+result = peak_overlaps.assign(index, peaks, mode=args.overlap, workers=args.workers)
+
+# Count matrix
+header, rows = result.count_table()
+out = open(args.counts, "w")
+out.write("\t".join(header) + "\n")
+for row in rows:
+    out.write("\t".join(str(x) for x in row) + "\n")
+out.close()
+
+# Every peak, in the order they were sorted in (sample, chromosome, start)
+if args.assignments:
+    out = open(args.assignments, "w")
+    out.write("sample\tchrom\tstart\tend\tfeatures\n")
+    for i in range(len(peaks.starts)):
+        out.write("%s\t%s\t%d\t%d\t%s\n" % (peaks.samples[peaks.sample[i]], peaks.chroms[i],
+                                            peaks.starts[i], peaks.ends[i], result.peak_types[i]))
+    out.close()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+"""
+Usage: ./diff_peaks.py [--min-overlap <fraction>] <condition 1 peaks> <condition 2 peaks>
+                       <output prefix>
+
+<condition 1 peaks>  MACS peak file (BED or narrowPeak) for the first condition, e.g. G1E
+<condition 2 peaks>  MACS peak file for the second condition, e.g. ER4
+<output prefix>      Writes <prefix>_gained.bed, <prefix>_lost.bed, <prefix>_shared.bed and
+                     <prefix>_summary.tsv
+--min-overlap        Fraction of a peak that has to be overlapped by a peak in the other
+                     condition for it to count as shared (default: 0, i.e. at least 1 bp)
+
+Finds the peaks gained (only in condition 2), lost (only in condition 1) and shared (condition 1
+peaks also found in condition 2) between two conditions, without going through bedtools (see
+differential_peaks.py). The BED files have the chromosome, start and end of each peak, sorted.
+"""
+
+import argparse
+import feature_index
+import differential_peaks
+
+parser = argparse.ArgumentParser()
+parser.add_argument("peaks_1")
+parser.add_argument("peaks_2")
+parser.add_argument("prefix")
+parser.add_argument("--min-overlap", type=float, default=0.0)
+args = parser.parse_args()
+
+result = differential_peaks.differential(feature_index.read_bed(args.peaks_1),
+                                         feature_index.read_bed(args.peaks_2),
+                                         args.min_overlap)
+
+for name in ["gained", "lost", "shared"]:
+    result.write_bed("%s_%s.bed" % (args.prefix, name), name)
+
+summary = result.summary()
+out = open(args.prefix + "_summary.tsv", "w")
+out.write("set\tpeaks\n")
+for name in ["gained", "lost", "shared"]:
+    out.write("%s\t%d\n" % (name, summary[name]))
+out.close()
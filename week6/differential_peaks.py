@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Differential peaks between two conditions: which peaks are gained, lost, or shared.
+
+A peak in one condition is matched if some peak in the other condition overlaps at least
+min_fraction of its length (at least 1 bp when min_fraction is 0), like bedtools intersect -f.
+The other condition's peaks go into a FeatureIndex (sorted arrays, see feature_index.py), every
+peak is looked up with a binary search, and the overlap lengths of the candidate pairs are
+computed at once, so the whole comparison is O(n log n).
+
+lost    - Condition 1 peaks with no match in condition 2
+gained  - Condition 2 peaks with no match in condition 1
+shared  - Condition 1 peaks with a match in condition 2
+
+Example:
+    result = differential(read_bed("G1E.bed"), read_bed("ER4.bed"), min_fraction=0.5)
+    result.summary()        # {"gained": ..., "lost": ..., "shared": ...}
+    result.write_bed("G1E_ER4_gained.bed", "gained")
+"""
+
+import numpy as np
+import feature_index
+
+
+def matched(peaks, others, min_fraction=0.0):
+    """
+    For every peak in peaks (chroms, starts, ends), whether a peak in others overlaps at least
+    min_fraction of it.
+    """
+    chroms, starts, ends = peaks
+    if len(others[0]) == 0 or len(starts) == 0:
+        return np.zeros(len(starts), dtype=bool)
+    index = feature_index.FeatureIndex(others[0], others[1], others[2], others[0])
+    query, other = index.overlaps(chroms, starts, ends, mode="partial")
+    overlap = np.minimum(ends[query], index.ends[other]) - np.maximum(starts[query], index.starts[other])
+    # Best overlap of every peak with any single peak of the other condition
+    best = np.zeros(len(starts), dtype=np.int64)
+    np.maximum.at(best, query, overlap)
+    needed = np.maximum(np.ceil(min_fraction * (ends - starts)), 1)
+    return best >= needed
+
+
+class Differential(object):
+
+    def __init__(self, peaks_1, peaks_2, matched_1, matched_2):
+        self.sets = {"lost": select(peaks_1, ~matched_1),
+                     "gained": select(peaks_2, ~matched_2),
+                     "shared": select(peaks_1, matched_1)}
+
+    def summary(self):
+        return dict((name, len(peaks[0])) for name, peaks in self.sets.items())
+
+    def write_bed(self, filename, name):
+        chroms, starts, ends = self.sets[name]
+        out = open(filename, "w")
+        for chrom, start, end in zip(chroms, starts, ends):
+            out.write("%s\t%d\t%d\n" % (chrom, start, end))
+        out.close()
+
+
+def select(peaks, chosen):
+    # The chosen peaks, sorted by chromosome and start
+    chroms, starts, ends = [x[chosen] for x in peaks]
+    order = np.lexsort((ends, starts, chroms))
+    return chroms[order], starts[order], ends[order]
+
+
+def differential(peaks_1, peaks_2, min_fraction=0.0):
+    return Differential(peaks_1, peaks_2, matched(peaks_1, peaks_2, min_fraction),
+                        matched(peaks_2, peaks_1, min_fraction))
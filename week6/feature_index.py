@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+"""
+Genome feature index: which annotated features (exons, introns, promoters, ...) a set of
+intervals overlaps.
+
+Features are kept per chromosome as sorted arrays instead of one entry per base pair. Each
+chromosome's features are split into length classes (lengths from 2^k up to 2^(k + 1) - 1 bases,
+for every k that occurs), and each class keeps its features' starts sorted:
+
+ids      - The features of the class (indexes into the whole index), by start
+starts   - Their start positions, sorted
+longest  - The longest feature in the class
+
+For a query [start, end), the features of a class that can overlap it start in
+(start - longest, end), which is two binary searches (np.searchsorted). A candidate that doesn't
+overlap ends at or before start, and since it's at least half as long as longest it covers base
+start - longest / 2, so the wasted candidates are never more than the class's features piled up
+on one base. One multi-megabase intron or whole-chromosome region only lands in its own class
+instead of widening the search for every query after it. Memory is proportional to the number of
+features, and each lookup is O(log n) per class plus the candidates. Overlapping features are all
+kept, so an interval can match any number of them.
+
+Overlap modes:
+start    - The feature contains the interval's start position (what plots.py used to do)
+partial  - The feature and the interval share at least one base
+full     - The feature contains the whole interval
+
+Example:
+    index = FeatureIndex(*read_bed("features.bed", 4))
+    query, feature = index.overlaps(chroms, starts, ends, mode="partial")
+    index.types[feature]      # the feature type of every (interval, feature) match
+"""
+
+import io
+import numpy as np
+import pandas as pd
+
+MODES = ["start", "partial", "full"]
+
+
+def read_bed(filename, n_columns=3):
+    """
+    The first n_columns of a BED-like file (chrom, start, end, then e.g. name/type) as arrays.
+    Comment, track and browser lines are skipped.
+    """
+    # Header lines (MACS starts its peaks with a track line) don't have the columns the typed
+    # parse expects, so drop them before pandas sees the file
+    lines = [line for line in open(filename) if not line.startswith(("#", "track", "browser"))]
+    try:
+        df = pd.read_table(io.StringIO("".join(lines)), header=None, usecols=range(n_columns),
+                           dtype={0: str, 1: np.int64, 2: np.int64})
+    except pd.errors.EmptyDataError:
+        return tuple([np.zeros(0, dtype=str)] + [np.zeros(0, dtype=np.int64)] * 2 +
+                     [np.zeros(0, dtype=str)] * (n_columns - 3))
+    return tuple(df[i].to_numpy(dtype=str if i in (0, 3) else np.int64) for i in range(n_columns))
+
+
+def expand_ranges(lows, highs):
+    # (which range, value) for every value in every range [lows[i], highs[i])
+    lengths = np.maximum(highs - lows, 0)
+    which = np.repeat(np.arange(len(lows)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return which, lows[which] + offsets
+
+
+class FeatureIndex(object):
+
+    def __init__(self, chroms, starts, ends, types):
+        chroms = np.asarray(chroms, dtype=str)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        # Sort every feature by chromosome, then start; each chromosome is then one slice
+        order = np.lexsort((starts, chroms))
+        self.chroms = chroms[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.types = np.asarray(types, dtype=str)[order]
+        self.type_names = sorted(set(self.types.tolist()))
+
+        # chromosome -> [(ids, starts, longest), ...], one entry per length class
+        self.classes = {}
+        lengths = np.maximum(self.ends - self.starts, 1)
+        length_class = np.floor(np.log2(lengths)).astype(np.int64)
+        names, firsts = np.unique(self.chroms, return_index=True)
+        lasts = np.append(firsts[1:], len(self.chroms)) if len(firsts) else firsts
+        for name, first, last in zip(names, firsts, lasts):
+            self.classes[name] = []
+            # The features are already sorted by start, so each class's ids are too
+            ids = np.arange(first, last)
+            for k in np.unique(length_class[first:last]):
+                chosen = ids[length_class[first:last] == k]
+                self.classes[name].append((chosen, self.starts[chosen], int(lengths[chosen].max())))
+
+    def overlaps(self, chroms, starts, ends, mode="partial"):
+        """
+        Every (interval, feature) pair that overlaps under the given mode. Returns two arrays:
+        the index of the interval in the query arrays, and the index of the feature (into
+        self.starts, self.types, ...), ordered by interval and then feature start.
+        """
+        if mode not in MODES:
+            raise ValueError("mode should be one of %s, not %s" % (", ".join(MODES), mode))
+        chroms = np.asarray(chroms, dtype=str)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        # For the start mode the query is just the start base
+        if mode == "start":
+            ends = starts + 1
+
+        queries, features = [], []
+        for chrom in np.unique(chroms):
+            if chrom not in self.classes:
+                continue
+            chosen = np.flatnonzero(chroms == chrom)
+            for ids, class_starts, longest in self.classes[chrom]:
+                # Candidate features: start before the query ends, and late enough to reach
+                # past its start
+                lows = np.searchsorted(class_starts, starts[chosen] - longest, side="right")
+                highs = np.searchsorted(class_starts, ends[chosen], side="left")
+                which, position = expand_ranges(lows, highs)
+                query, feature = chosen[which], ids[position]
+                if mode == "full":
+                    keep = (self.starts[feature] <= starts[query]) & (self.ends[feature] >= ends[query])
+                else:
+                    keep = self.ends[feature] > starts[query]
+                queries.append(query[keep])
+                features.append(feature[keep])
+
+        if not queries:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        query, feature = np.concatenate(queries), np.concatenate(features)
+        order = np.lexsort((feature, query))
+        return query[order], feature[order]
+
+    def count_types(self, chroms, starts, ends, mode="partial", other="other"):
+        """
+        Number of intervals that overlap each feature type. An interval overlapping several
+        types (e.g. an exon and an intron) counts once for each of them, and once however many
+        features of one type it overlaps; intervals overlapping nothing are counted as other.
+        """
+        query, feature = self.overlaps(chroms, starts, ends, mode)
+        type_codes = np.searchsorted(self.type_names, self.types[feature])
+        # Each distinct (interval, type) pair counts once
+        pairs = np.unique(query * len(self.type_names) + type_codes)
+        counts = np.bincount(pairs % len(self.type_names), minlength=len(self.type_names)) \
+            if len(self.type_names) else np.zeros(0, dtype=np.int64)
+        result = dict(zip(self.type_names, counts.tolist()))
+        result[other] = int(len(starts) - len(np.unique(query)))
+        return result
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Feature overlaps for many peak files at once.
+
+All the peak files are read into one set of arrays (with the sample each peak came from), and
+every peak of every sample is looked up in the FeatureIndex (see feature_index.py) together,
+one chromosome at a time. Chromosomes are independent, so they can be spread over a process
+pool. The results are:
+
+- A samples x feature types count matrix: how many of each sample's peaks overlap each type
+  (a peak overlapping several types counts for each; peaks overlapping nothing are "other")
+- Per-peak assignments: every peak with the feature types it overlaps
+
+Example:
+    peaks = Peaks.read(["G1E.bed", "ER4.bed"])
+    result = assign(index, peaks, mode="partial", workers=4)
+    result.counts           # samples x (index.type_names + ["other"])
+    result.peak_types       # for every peak, e.g. "exon,intron" or "other"
+"""
+
+import os
+import sys
+import numpy as np
+import feature_index
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+OTHER = "other"
+
+
+def sample_name(filename):
+    # G1E_peaks.narrowPeak -> G1E_peaks
+    return os.path.basename(filename).split(".")[0]
+
+
+class Peaks(object):
+    # Peaks from any number of samples, sorted once by sample, chromosome and start
+
+    def __init__(self, samples, sample, chroms, starts, ends):
+        order = np.lexsort((starts, chroms, sample))
+        self.samples = list(samples)
+        self.sample = np.asarray(sample, dtype=np.int64)[order]
+        self.chroms = np.asarray(chroms, dtype=str)[order]
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+
+    @classmethod
+    def read(cls, filenames):
+        sample, chroms, starts, ends = [], [], [], []
+        for i, filename in enumerate(filenames):
+            c, s, e = feature_index.read_bed(filename)
+            sample.append(np.full(len(c), i, dtype=np.int64))
+            chroms.append(c)
+            starts.append(s)
+            ends.append(e)
+        if not filenames:
+            return cls([], [], [], [], [])
+        return cls([sample_name(f) for f in filenames], np.concatenate(sample),
+                   np.concatenate(chroms), np.concatenate(starts), np.concatenate(ends))
+
+
+class Assignments(object):
+
+    def __init__(self, samples, type_names, counts, peak_types):
+        self.samples = samples
+        self.type_names = type_names
+        self.counts = counts
+        self.peak_types = peak_types
+
+    def count_table(self):
+        # Header and rows of the count matrix, one row per sample
+        header = ["sample"] + self.type_names
+        rows = [[sample] + [int(x) for x in row] for sample, row in zip(self.samples, self.counts)]
+        return header, rows
+
+
+# The index and peaks being assigned. Pool workers are forked after this is filled in, so they
+# inherit it instead of having it pickled for every chromosome
+job = {}
+
+
+def overlap_chromosome(chrom):
+    # (peak, feature) overlaps for the peaks on one chromosome
+    index, peaks, mode = job["index"], job["peaks"], job["mode"]
+    chosen = np.flatnonzero(peaks.chroms == chrom)
+    query, feature = index.overlaps(peaks.chroms[chosen], peaks.starts[chosen],
+                                    peaks.ends[chosen], mode)
+    return chosen[query], feature
+
+
+def assign(index, peaks, mode="partial", workers=1):
+    """
+    Assign every peak of every sample to the feature types it overlaps, looking up the
+    chromosomes in a pool of workers if workers > 1. Returns an Assignments.
+    """
+    job.update(index=index, peaks=peaks, mode=mode)
+    chromosomes = np.unique(peaks.chroms).tolist()
+    if workers > 1 and len(chromosomes) > 1:
+        with startup.process_pool(workers) as pool:
+            results = pool.map(overlap_chromosome, chromosomes)
+    else:
+        results = [overlap_chromosome(chrom) for chrom in chromosomes]
+    peak = np.concatenate([r[0] for r in results] or [np.zeros(0, dtype=np.int64)])
+    feature = np.concatenate([r[1] for r in results] or [np.zeros(0, dtype=np.int64)])
+
+    # Distinct (peak, feature type) pairs
+    n_types = len(index.type_names)
+    type_codes = np.searchsorted(index.type_names, index.types[feature])
+    pairs = np.unique(peak * n_types + type_codes) if n_types else np.zeros(0, dtype=np.int64)
+    pair_peaks, pair_types = pairs // max(n_types, 1), pairs % max(n_types, 1)
+
+    # Count matrix: samples x types, plus other for peaks with no pairs
+    n_samples = len(peaks.samples)
+    counts = np.zeros((n_samples, n_types + 1), dtype=np.int64)
+    np.add.at(counts, (peaks.sample[pair_peaks], pair_types), 1)
+    annotated = np.zeros(len(peaks.starts), dtype=bool)
+    annotated[pair_peaks] = True
+    counts[:, n_types] = np.bincount(peaks.sample[~annotated], minlength=n_samples)
+
+    # Per-peak types, e.g. "exon,intron", in type name order
+    peak_types = [[] for i in range(len(peaks.starts))]
+    for p, t in zip(pair_peaks.tolist(), pair_types.tolist()):
+        peak_types[p].append(index.type_names[t])
+    peak_types = [",".join(types) if types else OTHER for types in peak_types]
+
+    return Assignments(peaks.samples, index.type_names + [OTHER], counts, peak_types)
+
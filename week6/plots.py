@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 """
-Usage: ./plots.py <gained> <lost> <G1E file> <ER4 file> <features>
+Usage: ./plots.py [--no-plot] [--overlap start|partial|full] [--differential]
+                  [--min-overlap <fraction>] <gained> <lost> <G1E file> <ER4 file> <features>
 
 <gained> - Table of CTCF binding sites (start and end positions) gained from G1E to ER4 
 differentiation
@@ -9,18 +10,45 @@ differentiation
 <G1E file> - Table of CTCF binding sites in G1E cells
 <ER4 file> - Table of CTCF binding sites in ER4 cells
 <features> - Table of genome features (exon, intron, promoter) and their start/end positions
+--overlap - How a CTCF site has to overlap a feature to be counted in it (default: partial):
+            start (the feature contains the site's start), partial (they share at least one
+            base) or full (the feature contains the whole site)
+--differential - Work out the gained and lost sites from the G1E and ER4 files (see
+            differential_peaks.py) and write them to <gained> and <lost>, instead of reading
+            them from there
+--min-overlap - With --differential, the fraction of a site that a site in the other cell type
+            has to overlap for the site to count as kept (default: 0, i.e. at least 1 bp)
 
 This script analyzes ChIP-seq peaks identified through MACS.
 
 It outputs two plots:
 1. Barplot showing # of CTCF binding sites gained and lost between states
 2. Number of CTCF binding sites associated with each feature type
+
+With --no-plot, the bar heights of both plots are written to plots.tsv instead.
 """
 
+import os
 import sys
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
+import feature_index
+import peak_overlaps
+import differential_peaks
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("gained")
+parser.add_argument("lost")
+parser.add_argument("G1E")
+parser.add_argument("ER4")
+parser.add_argument("features")
+parser.add_argument("--no-plot", action="store_true")
+parser.add_argument("--overlap", choices=feature_index.MODES, default="partial")
+parser.add_argument("--differential", action="store_true")
+parser.add_argument("--min-overlap", type=float, default=0.0)
+args = parser.parse_args()
 
 """
 PART 1
@@ -28,8 +56,16 @@ PART 1
 Count number of CTCF sites lost and gained between G1E and ER4.
 """
 
-gained = open(sys.argv[1])
-lost = open(sys.argv[2])
+# Work out the gained and lost sites here, or use files made beforehand (e.g. with bedtools)
+if args.differential:
+    differential = differential_peaks.differential(feature_index.read_bed(args.G1E),
+                                                   feature_index.read_bed(args.ER4),
+                                                   args.min_overlap)
+    differential.write_bed(args.gained, "gained")
+    differential.write_bed(args.lost, "lost")
+
+gained = open(args.gained)
+lost = open(args.lost)
 
 # Count number of lines in tje gained and lost files
 gain_count = 0
@@ -49,54 +85,25 @@ PART 2
 
 Count how many CTCF sites in G1E and ER4 overlap annotated genome features.
 
-This method is unable to handle the following cases:
-
-- Overlapping features. If an exon and intron overlap, the second annotated feature will overwrite
-the part of the first that it overlaps.
-- CTCF sites that only partially overlap features. If the CTCF site starts outside of a feature, it
-will be counted as "other."
-- CTCF sites that overlap multiple features. Every site will be counted in the feature that has its
-start position.
+The features are kept as sorted interval arrays per chromosome (see feature_index.py), so
+memory only depends on the number of features, and each CTCF site is looked up with a binary
+search. Overlapping features are all kept: a site that overlaps an exon and an intron counts
+for both, and sites that overlap no feature are counted as "other".
 """
 
-G1E_file = open(sys.argv[3])
-ER4_file = open(sys.argv[4])
-features_file = open(sys.argv[5])
-
-# Make dictionary of all nucleotide positions that features cover, and which features they correspond to
-positions = {}
-for line in features_file:
-    fields = line.rstrip("\r\n").split()
-    # Get start and end position of each feature
-    start = int(fields[1])
-    end = int(fields[2])
-    feat_type = fields[3]
-    # For every nucleotide within the feature, annotate it with the feature type
-    for position in range(start, end):
-        positions[position] = feat_type
-
-# Iterate through the list of CTCF sites and keep track of which features they overlap with
-def count_features(filename):
-    # Create dictionary where the keys are the feature types and the values are a running count of CTCF sites
-    features = {"other":0}
-    for line in filename:
-        fields = line.rstrip("\r\n").split()
-        start = int(fields[1])
-        # With this method, every CTCF site will be categorized according to whether its start site is within a feature
-        if start in positions:
-            feat_type = positions[start]
-            if feat_type in features:
-                features[feat_type] += 1
-            else:
-                features[feat_type] = 1
-        # If the start site doesn't fall within an annotated feature, count it as "other"
-        else:
-            features["other"] += 1
-    return(features)
-
-# Count features 
-G1E_features = count_features(G1E_file)
-ER4_features = count_features(ER4_file)
+# Index the features by chromosome and position
+features = feature_index.FeatureIndex(*feature_index.read_bed(args.features, 4))
+
+# Count how many CTCF sites in each file overlap each type of feature, both files in one pass
+# (see peak_overlaps.py)
+peaks = peak_overlaps.Peaks.read([args.G1E, args.ER4])
+result = peak_overlaps.assign(features, peaks, mode=args.overlap)
+G1E_features, ER4_features = [dict(zip(result.type_names, row.tolist())) for row in result.counts]
+
+# Feature types that no site overlaps still get a bar
+for counts in (G1E_features, ER4_features):
+    for feat_type in ["intron", "exon", "promoter"]:
+        counts.setdefault(feat_type, 0)
 
 # Get x and y values for barplot
 y_vals_G1E = [G1E_features["intron"], G1E_features["exon"], G1E_features["promoter"], \
@@ -109,29 +116,37 @@ x_vals_2 = np.arange(4)
 """
 PART 3
 
-Make plots.
+Make plots, or write out the numbers behind them.
 """
 
-fig, (ax1, ax2) = plt.subplots(ncols=2, figsize=(13,5))
-
-# Plot barplot of gained/lost CTCF sites
-ax1.bar(x_vals_1, y_vals, width=0.5, color="royalblue")
-ax1.set_xticks(x_vals_1)
-ax1.set_xticklabels(["Gained", "Lost"])
-ax1.set_xlabel("Change during differentiation")
-ax1.set_ylabel("Number of CTCF sites")
-ax1.set_title("Change in CTCF binding sites during G1E to ER4 differentiation")
-
-# Plot stacked barplot of CTCF sites overlapping with features
-p1 = ax2.bar(x_vals_2, y_vals_G1E, color="rebeccapurple")
-p2 = ax2.bar(x_vals_2, y_vals_ER4, bottom=y_vals_G1E, color="pink")
-ax2.set_xticks(x_vals_2)
-ax2.set_xticklabels(["Introns", "Exons", "Promoters", "Other"])
-ax2.legend((p1[0], p2[0]), ("G1E", "ER4"))
-ax2.set_xlabel("Type of region")
-ax2.set_ylabel("Number of CTCF sites")
-ax2.set_title("Types of features bound by CTCF")
-
-plt.tight_layout()
-fig.savefig("plots.png")
-plt.close(fig)
\ No newline at end of file
+if args.no_plot:
+    # One row per bar: which plot it belongs to, the bar's label, and its height
+    groups = ["change"] * 2 + ["G1E"] * 4 + ["ER4"] * 4
+    labels = ["Gained", "Lost"] + ["intron", "exon", "promoter", "other"] * 2
+    startup.write_table("plots.tsv", ["group", "label", "count"],
+                        [groups, labels, y_vals + y_vals_G1E + y_vals_ER4])
+else:
+    plt = startup.pyplot()
+    fig, (ax1, ax2) = plt.subplots(ncols=2, figsize=(13,5))
+
+    # Plot barplot of gained/lost CTCF sites
+    ax1.bar(x_vals_1, y_vals, width=0.5, color="royalblue")
+    ax1.set_xticks(x_vals_1)
+    ax1.set_xticklabels(["Gained", "Lost"])
+    ax1.set_xlabel("Change during differentiation")
+    ax1.set_ylabel("Number of CTCF sites")
+    ax1.set_title("Change in CTCF binding sites during G1E to ER4 differentiation")
+
+    # Plot stacked barplot of CTCF sites overlapping with features
+    p1 = ax2.bar(x_vals_2, y_vals_G1E, color="rebeccapurple")
+    p2 = ax2.bar(x_vals_2, y_vals_ER4, bottom=y_vals_G1E, color="pink")
+    ax2.set_xticks(x_vals_2)
+    ax2.set_xticklabels(["Introns", "Exons", "Promoters", "Other"])
+    ax2.legend((p1[0], p2[0]), ("G1E", "ER4"))
+    ax2.set_xlabel("Type of region")
+    ax2.set_ylabel("Number of CTCF sites")
+    ax2.set_title("Types of features bound by CTCF")
+
+    plt.tight_layout()
+    fig.savefig("plots.png")
+    plt.close(fig)
\ No newline at end of file
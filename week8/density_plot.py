@@ -1,43 +1,82 @@
 #!/usr/bin/env python3
 
 """
-Usage: density_plot.py <bedtools_file.txt>
+Usage: density_plot.py [--no-plot] [--bins <n>] [--hits] [--peak-start <col>] [--peak-end <col>]
+                       [--motif-start <col>] [--motif-end <col>] [--strand <col>]
+                       [--motif-id <col>] [--motif-pattern <regex>] <bedtools_file.txt>
 
-<bedtools_file.txt> - A table containing the start and end positions of ChIP-seq peaks, and the 
+<bedtools_file.txt> - A table containing the start and end positions of ChIP-seq peaks, and the
 start position of the motif associated with each peak
+--bins - Number of bins between the start (0) and end (1) of the peaks (default: 30)
+--hits - The file is a hit table from scan_motifs.py: sets all the column options below, with
+one profile per motif on both strands
+--peak-start, --peak-end, --motif-start - 0-based columns of the peak start and end and the
+motif start (defaults: 1, 2 and 13, for bedtools intersect of a narrowPeak file with fimo.gff)
+--motif-end, --strand - Columns of the motif end and strand. With both, motifs on the - strand
+are measured from the end of the peak instead
+--motif-id - Column with the motif's ID, to make one profile per motif
+--motif-pattern - Regular expression with one group that pulls the ID out of the --motif-id
+column, e.g. "Name=([^;]+)" for GFF attributes
 
 This script plots a histogram of the relative start positions of identified motifs within ChIP-seq
-peaks.
+peaks (one per motif with --motif-id). The file is read a chunk at a time and binned as it's read
+(see motif_profile.py), so only the bin counts are kept. With --no-plot, the bin counts for every
+motif are written to position_freq.tsv instead.
 """
 
+import os
 import sys
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
-
-f = open(sys.argv[1])
-
-positions = []
-
-for line in f:
-    fields = line.rstrip("\t").split()
-    # Pull out ChIP-seq peak start and end position, and motif start position
-    seq_start = int(fields[1])
-    seq_end = int(fields[2])
-    motif_start = int(fields[13])
-    
-    # Calculate length of the ChIP-seq peak
-    seq_length = seq_end - seq_start
-    # Calculate distance between motif start position and the ChIP-seq peak start position
-    position = motif_start - seq_start
-    # Calculate relative motif start position
-    rel_pos = position/seq_length
-    positions.append(rel_pos)
-    
+import argparse
+import motif_profile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("bedtools")
+parser.add_argument("--no-plot", action="store_true")
+parser.add_argument("--bins", type=int, default=30)
+parser.add_argument("--peak-start", type=int, default=motif_profile.DEFAULT_COLUMNS["peak_start"])
+parser.add_argument("--peak-end", type=int, default=motif_profile.DEFAULT_COLUMNS["peak_end"])
+parser.add_argument("--motif-start", type=int, default=motif_profile.DEFAULT_COLUMNS["motif_start"])
+parser.add_argument("--motif-end", type=int)
+parser.add_argument("--strand", type=int)
+parser.add_argument("--motif-id", type=int)
+parser.add_argument("--motif-pattern")
+parser.add_argument("--hits", action="store_true")
+args = parser.parse_args()
+
+if args.hits:
+    columns = motif_profile.HIT_COLUMNS
+else:
+    columns = {"peak_start": args.peak_start, "peak_end": args.peak_end,
+               "motif_start": args.motif_start, "motif_end": args.motif_end,
+               "strand": args.strand, "motif_id": args.motif_id}
+
+# Bin the relative motif positions a chunk of the file at a time
+profile = motif_profile.MotifProfile(args.bins)
+for motif_ids, positions in motif_profile.read_positions(args.bedtools, columns,
+                                                          motif_pattern=args.motif_pattern):
+    profile.add(motif_ids, positions)
+
 # Plot relative start positions in a histogram
-fig, ax = plt.subplots(figsize=(8,5))
-ax.hist(positions, color="royalblue", bins=30)
-ax.set_title("Distribution of relative motif locations in ChIP-seq peaks")
-ax.set_ylabel("Number of motifs")
-ax.set_xlabel("Relative location within ChIP-seq peak")
-plt.savefig("position_freq.png")
-plt.close(fig)
\ No newline at end of file
+if args.no_plot:
+    header, rows = profile.table()
+    startup.write_table("position_freq.tsv", header, list(zip(*rows)))
+else:
+    plt = startup.pyplot()
+    fig, ax = plt.subplots(figsize=(8,5))
+    edges = profile.edges
+    motifs = profile.motifs()
+    if len(motifs) == 1:
+        ax.hist(edges[:-1], bins=edges, weights=profile.counts[motifs[0]], color="royalblue")
+    else:
+        # One outline per motif, so they can be compared
+        for motif in motifs:
+            ax.hist(edges[:-1], bins=edges, weights=profile.counts[motif], histtype="step",
+                    label=motif)
+        ax.legend(fontsize=6, ncol=2)
+    ax.set_title("Distribution of relative motif locations in ChIP-seq peaks")
+    ax.set_ylabel("Number of motifs")
+    ax.set_xlabel("Relative location within ChIP-seq peak")
+    plt.savefig("position_freq.png")
+    plt.close(fig)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Profiles of where motifs sit inside ChIP-seq peaks.
+
+Every motif hit gets a relative position within its peak, from 0 (the peak's start) to 1 (its
+end). With strand information, hits on the - strand are measured from the other end, using the
+motif's end:
+
++ strand    (motif_start - peak_start) / (peak_end - peak_start)
+- strand    (peak_end - motif_end) / (peak_end - peak_start)
+
+Positions are clipped to [0, 1] (motifs hanging off the end of a peak count in the first or
+last bin) and added to a fixed-bin histogram per motif ID, so memory only depends on the number
+of motifs and bins, not on the number of hits.
+
+Input tables (e.g. bedtools intersect output) are read a chunk at a time with pandas; which
+column holds what is given by a dict of column roles (0-based column numbers):
+
+peak_start, peak_end, motif_start  - Required
+motif_end, strand                  - For strand-aware positions
+motif_id                           - To profile each motif separately
+
+Example:
+    profile = MotifProfile(bins=30)
+    for motif_ids, positions in read_positions("bedtools.out", DEFAULT_COLUMNS):
+        profile.add(motif_ids, positions)
+    header, rows = profile.table()
+"""
+
+import numpy as np
+import pandas as pd
+
+# bedtools intersect -wa -wb of a narrowPeak file (10 columns) with FIMO's GFF output
+DEFAULT_COLUMNS = {"peak_start": 1, "peak_end": 2, "motif_start": 13}
+# Hit tables written by scan_motifs.py
+HIT_COLUMNS = {"peak_start": 1, "peak_end": 2, "motif_id": 3, "motif_start": 4, "motif_end": 5,
+               "strand": 6}
+# Motif ID used when there's no motif_id column
+ALL_MOTIFS = "all"
+
+
+def relative_positions(peak_start, peak_end, motif_start, motif_end=None, strand=None):
+    # Relative motif positions within their peaks, flipped for - strand motifs if strand is given
+    peak_start = np.asarray(peak_start, dtype=float)
+    peak_end = np.asarray(peak_end, dtype=float)
+    distance = np.asarray(motif_start, dtype=float) - peak_start
+    if strand is not None and motif_end is not None:
+        minus = np.asarray(strand) == "-"
+        distance = np.where(minus, peak_end - np.asarray(motif_end, dtype=float), distance)
+    length = peak_end - peak_start
+    return np.clip(distance / np.where(length > 0, length, 1), 0, 1)
+
+
+def read_positions(filename, columns, chunk_size=100000, motif_pattern=None):
+    """
+    Yield (motif IDs, relative positions) a chunk of lines at a time. motif_pattern is an
+    optional regular expression with one group that pulls the ID out of the motif_id column
+    (e.g. "Name=([^;]+)" for GFF attributes).
+    """
+    roles = dict((role, column) for role, column in columns.items() if column is not None)
+    used = sorted(set(roles.values()))
+    try:
+        reader = pd.read_table(filename, header=None, usecols=used, chunksize=chunk_size,
+                               dtype={column: str for column in used}, comment="#")
+    except pd.errors.EmptyDataError:
+        return
+    for chunk in reader:
+        motif_end = chunk[roles["motif_end"]] if "motif_end" in roles else None
+        strand = chunk[roles["strand"]].to_numpy() if "strand" in roles else None
+        positions = relative_positions(chunk[roles["peak_start"]], chunk[roles["peak_end"]],
+                                       chunk[roles["motif_start"]], motif_end, strand)
+        if "motif_id" in roles:
+            ids = chunk[roles["motif_id"]]
+            if motif_pattern:
+                ids = ids.str.extract(motif_pattern, expand=False).fillna(ids)
+            ids = ids.to_numpy(dtype=str)
+        else:
+            ids = np.full(len(chunk), ALL_MOTIFS)
+        yield ids, positions
+
+
+class MotifProfile(object):
+
+    def __init__(self, bins=30):
+        self.edges = np.linspace(0, 1, bins + 1)
+        # motif ID -> count in each bin
+        self.counts = {}
+
+    def add(self, motif_ids, positions):
+        # Bin one batch of hits, all motifs at once: one bincount over (motif, bin) codes
+        motif_ids = np.asarray(motif_ids, dtype=str)
+        if len(motif_ids) == 0:
+            return
+        names, codes = np.unique(motif_ids, return_inverse=True)
+        n_bins = len(self.edges) - 1
+        bins = np.clip(np.searchsorted(self.edges, positions, side="right") - 1, 0, n_bins - 1)
+        counts = np.bincount(codes * n_bins + bins, minlength=len(names) * n_bins)
+        for name, row in zip(names.tolist(), counts.reshape(len(names), n_bins)):
+            if name in self.counts:
+                self.counts[name] += row
+            else:
+                self.counts[name] = row.astype(np.int64)
+
+    def merge(self, other):
+        # Add another profile with the same bins into this one
+        for name, row in other.counts.items():
+            if name in self.counts:
+                self.counts[name] += row
+            else:
+                self.counts[name] = row.copy()
+        return self
+
+    def motifs(self):
+        # Motif IDs, most hits first
+        return sorted(self.counts, key=lambda name: (-self.counts[name].sum(), name))
+
+    def table(self):
+        # One row per motif and bin
+        header = ["motif", "bin_start", "bin_end", "count"]
+        rows = []
+        for name in self.motifs():
+            for start, end, count in zip(self.edges[:-1], self.edges[1:], self.counts[name]):
+                rows.append([name, float(start), float(end), int(count)])
+        return header, rows
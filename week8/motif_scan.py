@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+Motif scanner: finds matches to MEME-format motifs in peak sequences, on both strands.
+
+Each motif's letter-probability matrix becomes a log-odds matrix (log2 of probability over
+background frequency, with a pseudocount like FIMO's), rounded to SCALE steps per bit. A
+sequence is one-hot encoded into a length x 4 array (N and other letters are all zeros), so
+
+contributions = one_hot @ log_odds.T        (length x motif width)
+
+gives the score of every base at every motif position, and the score of the window starting at
+i is the sum of contributions[i + j, j] over j, i.e. motif width shifted slices added together.
+The reverse strand is scanned with the reverse complement of the matrix on the same array.
+Windows containing an N are skipped.
+
+Scores are turned into p-values with the exact distribution of scores for random sequence
+drawn from the background (built by adding up the rounded log-odds one motif position at a
+time), and hits are kept if their p-value is at most the threshold (1e-4 by default, as in FIMO).
+
+Hits are (motif ID, start, end, strand, score, p-value) in the peak's genome coordinates, which
+is what motif_profile.py needs. scan_peaks() spreads the peaks over a process pool.
+
+Example:
+    motifs, background = read_meme("combined.meme")
+    scanner = Scanner(motifs, background, pvalue=1e-4)
+    for hit in scanner.scan("chr19", 1000, sequence):
+        ...
+"""
+
+import os
+import re
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+
+BASES = "ACGT"
+COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+# Steps per bit when rounding log-odds scores
+SCALE = 100
+PSEUDOCOUNT = 0.1
+DEFAULT_PVALUE = 1e-4
+# Number of sites assumed when a motif doesn't say (MEME's default)
+DEFAULT_NSITES = 20
+
+# One-hot rows for every byte: A, C, G, T (either case) get a 1 in their column
+ONE_HOT = np.zeros((256, 4), dtype=np.float32)
+for i, base in enumerate(BASES):
+    ONE_HOT[ord(base), i] = 1
+    ONE_HOT[ord(base.lower()), i] = 1
+
+
+class Motif(object):
+
+    def __init__(self, ident, name, probabilities, nsites=DEFAULT_NSITES):
+        self.id = ident
+        self.name = name
+        self.probabilities = np.asarray(probabilities, dtype=float)
+        self.nsites = nsites
+        self.width = len(self.probabilities)
+
+
+def read_meme(filename):
+    """
+    Motifs and background frequencies from a MEME-format file (MEME, MEME-ChIP, or a JASPAR
+    database from the MEME suite). Returns ([Motif, ...], background as A, C, G, T frequencies).
+    """
+    lines = [line.strip() for line in open(filename)]
+    background = np.full(4, 0.25)
+    motifs = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("Background letter frequencies"):
+            # e.g. "A 0.303 C 0.183 G 0.209 T 0.306", possibly over several lines
+            fields = []
+            i += 1
+            while i < len(lines) and lines[i] and len(fields) < 8:
+                fields += lines[i].split()
+                i += 1
+            frequencies = dict(zip(fields[0::2], fields[1::2]))
+            background = np.array([float(frequencies.get(base, 0.25)) for base in BASES])
+            continue
+        if line.startswith("MOTIF"):
+            fields = line.split()
+            ident = fields[1]
+            name = fields[2] if len(fields) > 2 else ident
+            # Find the matrix header, then read width rows of probabilities
+            while not lines[i].startswith("letter-probability matrix"):
+                i += 1
+            header = lines[i].split(":", 1)[1].replace("= ", "=").split()
+            settings = dict(field.split("=") for field in header if "=" in field)
+            width = int(settings["w"])
+            nsites = float(settings.get("nsites", DEFAULT_NSITES))
+            rows = []
+            i += 1
+            while len(rows) < width:
+                if lines[i]:
+                    rows.append([float(x) for x in lines[i].split()[:4]])
+                i += 1
+            motifs.append(Motif(ident, name, rows, nsites))
+            continue
+        i += 1
+    return motifs, background / background.sum()
+
+
+def log_odds(motif, background):
+    # Rounded log-odds matrix (width x 4, in steps of 1 / SCALE bits), with FIMO's pseudocount:
+    # the background spread over PSEUDOCOUNT extra sites
+    probabilities = (motif.probabilities * motif.nsites + PSEUDOCOUNT * background) / \
+        (motif.nsites + PSEUDOCOUNT)
+    return np.round(np.log2(probabilities / background) * SCALE).astype(np.int64)
+
+
+def score_distribution(matrix, background):
+    """
+    Exact distribution of window scores for background sequence. Returns (lowest score,
+    survival) where survival[s - lowest] is the probability of a score >= s.
+    """
+    lowest = int(matrix.min(axis=1).sum())
+    highest = int(matrix.max(axis=1).sum())
+    distribution = np.zeros(highest - lowest + 1)
+    distribution[0] = 1.0
+    for row in matrix:
+        # Add one motif position: shift the distribution by each base's score, weighted by its
+        # background frequency
+        step = np.zeros_like(distribution)
+        row_low = row.min()
+        for score, frequency in zip(row, background):
+            shift = score - row_low
+            step[shift:] += frequency * distribution[:len(distribution) - shift]
+        distribution = step
+    survival = np.cumsum(distribution[::-1])[::-1]
+    return lowest, np.minimum(survival, 1.0)
+
+
+def one_hot(sequence):
+    # length x 4 float32 array; sequence can be str or bytes
+    if isinstance(sequence, str):
+        sequence = sequence.encode("ascii")
+    return ONE_HOT[np.frombuffer(sequence, dtype=np.uint8)]
+
+
+def window_scores(encoded, matrix):
+    # Score of every window of the motif's width: contributions of each base at each motif
+    # position, summed along the diagonals
+    width = len(matrix)
+    n_windows = len(encoded) - width + 1
+    contributions = encoded @ matrix.T.astype(np.float32)
+    scores = np.zeros(n_windows, dtype=np.float32)
+    for j in range(width):
+        scores += contributions[j:j + n_windows, j]
+    return np.round(scores).astype(np.int64)
+
+
+class Scanner(object):
+
+    def __init__(self, motifs, background, pvalue=DEFAULT_PVALUE):
+        self.motifs = motifs
+        self.pvalue = pvalue
+        self.matrices = []
+        for motif in motifs:
+            matrix = log_odds(motif, background)
+            # Reverse complement: reverse the positions and swap A<->T, C<->G
+            reverse = matrix[::-1, ::-1]
+            lowest, survival = score_distribution(matrix, background)
+            # Lowest score whose p-value is within the threshold
+            passing = np.flatnonzero(survival <= pvalue)
+            threshold = lowest + passing[0] if len(passing) else None
+            self.matrices.append((matrix, reverse, lowest, survival, threshold))
+
+    def scan(self, chrom, offset, sequence):
+        """
+        Hits in one sequence that starts at offset on chrom. Returns a list of (motif ID, start,
+        end, strand, score in bits, p-value), with genome coordinates (0-based, end exclusive).
+        """
+        encoded = one_hot(sequence)
+        # Windows with anything other than A, C, G or T are skipped
+        unknown = np.concatenate([[0], np.cumsum(encoded.sum(axis=1) == 0)])
+        hits = []
+        for motif, (matrix, reverse, lowest, survival, threshold) in zip(self.motifs, self.matrices):
+            width = motif.width
+            if threshold is None or len(encoded) < width:
+                continue
+            clean = (unknown[width:] - unknown[:-width]) == 0
+            for strand, strand_matrix in [("+", matrix), ("-", reverse)]:
+                scores = window_scores(encoded, strand_matrix)
+                for start in np.flatnonzero((scores >= threshold) & clean):
+                    score = scores[start]
+                    hits.append((motif.id, offset + int(start), offset + int(start) + width,
+                                 strand, score / SCALE, float(survival[score - lowest])))
+        return hits
+
+
+def peak_coordinates(name, length):
+    # (chrom, start, end, strand) from a bedtools getfasta name like chr19:1000-1200, or
+    # chr19:1000-1200(-) with getfasta -s (strand is "+" without one), or the whole sequence if
+    # the name isn't like that
+    match = re.match(r"^(.+):(\d+)-(\d+)(?:\(([+-])\))?", name)
+    if match:
+        return match.group(1), int(match.group(2)), int(match.group(3)), match.group(4) or "+"
+    return name, 0, length, "+"
+
+
+def reverse_complement(sequence):
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+# The scanner and peaks being scanned. Pool workers are forked after this is filled in, so they
+# inherit it instead of having it pickled for every shard
+job = {}
+
+
+def scan_shard(bounds):
+    # Hits for peaks[first:last], as rows of (chrom, peak start, peak end, motif ID, motif start,
+    # motif end, strand, score, p-value)
+    first, last = bounds
+    rows = []
+    for i in range(first, last):
+        chrom, start, end = job["peaks"][i]
+        sequence = job["fetch"](i)
+        for hit in job["scanner"].scan(chrom, start, sequence):
+            rows.append((chrom, start, end) + hit)
+    return rows
+
+
+def scan_peaks(scanner, peaks, fetch, workers=1, shard_size=500):
+    """
+    Scan every peak (a list of (chrom, start, end)); fetch(i) returns the sequence of peaks[i],
+    on the + strand. Yields lists of hit rows (see scan_shard), one shard of peaks at a time and in
+    peak order, with the shards spread over a pool of workers if workers > 1.
+    """
+    job.update(scanner=scanner, peaks=peaks, fetch=fetch)
+    shards = [(first, min(first + shard_size, len(peaks)))
+              for first in range(0, len(peaks), shard_size)]
+    if workers > 1 and len(shards) > 1:
+        with startup.process_pool(workers) as pool:
+            for rows in pool.imap(scan_shard, shards):
+                yield rows
+    else:
+        for shard in shards:
+            yield scan_shard(shard)
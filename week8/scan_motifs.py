@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Usage: scan_motifs.py [--genome <genome.fa>] [--pvalue <p>] [--workers <n>] [--profile <table>]
+                      [--bins <n>] <motifs.meme> <peaks> <hits.tsv>
+
+<motifs.meme> - Motifs in MEME format, e.g. meme-chip/combined.meme or a JASPAR .meme database
+<peaks> - With --genome, a MACS peak file (BED or narrowPeak); the peak sequences are read from
+the genome FASTA. Without it, a FASTA file of peak sequences from bedtools getfasta (named like
+chr19:1000-1200, or chr19:1000-1200(-) with -s, so hits can be placed in the genome)
+<hits.tsv> - Where to write the hits (after a "#" header line): chrom, peak_start, peak_end, motif_id, motif_start,
+motif_end, strand, score (bits) and p-value, one line per hit
+--pvalue - Keep hits with at most this p-value (default: 1e-4)
+--workers - Scan peaks in this many processes (default: 1)
+--profile - Also bin the relative hit positions in each peak (see motif_profile.py) and write
+the per-motif table, the same as density_plot.py --hits --no-plot writes
+--bins - Number of bins for --profile (default: 30)
+
+This script scans ChIP-seq peaks for motif matches on both strands (see motif_scan.py), instead
+of running FIMO and bedtools intersect. The hit table can be plotted with density_plot.py --hits.
+"""
+
+import os
+import sys
+import argparse
+import motif_scan
+import motif_profile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+import startup
+from fasta_index import IndexedFASTA
+
+parser = argparse.ArgumentParser()
+parser.add_argument("motifs")
+parser.add_argument("peaks")
+parser.add_argument("hits")
+parser.add_argument("--genome")
+parser.add_argument("--pvalue", type=float, default=motif_scan.DEFAULT_PVALUE)
+parser.add_argument("--workers", type=int, default=1)
+parser.add_argument("--profile")
+parser.add_argument("--bins", type=int, default=30)
+args = parser.parse_args()
+
+motifs, background = motif_scan.read_meme(args.motifs)
+scanner = motif_scan.Scanner(motifs, background, args.pvalue)
+for motif, (matrix, reverse, lowest, survival, threshold) in zip(motifs, scanner.matrices):
+    if threshold is None:
+        sys.stderr.write("Motif %s can't reach p <= %g, skipping it\n" % (motif.id, args.pvalue))
+
+# Peaks as (chrom, start, end), and a way to get the + strand sequence of peaks[i]
+if args.genome:
+    genome = IndexedFASTA(args.genome)
+    peaks = []
+    for line in open(args.peaks):
+        fields = line.split()
+        if not fields or fields[0].startswith(("#", "track", "browser")):
+            continue
+        peaks.append((fields[0], int(fields[1]), int(fields[2])))
+    fetch = lambda i: genome.fetch(*peaks[i])
+else:
+    # Each sequence's name gives its coordinates. getfasta can write the same name more than
+    # once (and the same interval on both strands with -s), so peaks[i] is record i and
+    # sequences are fetched by record number. Records from the - strand are turned back around,
+    # so every hit is placed on the genome the same way
+    sequences = IndexedFASTA(args.peaks)
+    peaks = []
+    minus = []
+    for entry in sequences.entries:
+        chrom, start, end, strand = motif_scan.peak_coordinates(entry[0], entry[1])
+        peaks.append((chrom, start, end))
+        minus.append(strand == "-")
+
+    def fetch(i):
+        sequence = sequences.fetch(i)
+        return motif_scan.reverse_complement(sequence) if minus[i] else sequence
+
+# Scan the peaks a shard at a time, writing the hits (and binning them) as they come back
+profile = motif_profile.MotifProfile(args.bins)
+out = open(args.hits, "w")
+out.write("#chrom\tpeak_start\tpeak_end\tmotif_id\tmotif_start\tmotif_end\tstrand\tscore\tpvalue\n")
+for rows in motif_scan.scan_peaks(scanner, peaks, fetch, workers=args.workers):
+    for row in rows:
+        out.write("%s\t%d\t%d\t%s\t%d\t%d\t%s\t%g\t%g\n" % row)
+    if args.profile and rows:
+        chrom, peak_start, peak_end, motif_id, motif_start, motif_end, strand, score, pvalue = zip(*rows)
+        profile.add(motif_id, motif_profile.relative_positions(peak_start, peak_end, motif_start,
+                                                               motif_end, strand))
+out.close()
+
+if args.profile:
+    header, rows = profile.table()
+    startup.write_table(args.profile, header, list(zip(*rows)))